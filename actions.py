@@ -43,16 +43,18 @@ class PickupAction(Action):
         super().__init__(entity)
 
     def perform(self) -> None:
+        from entity import Item
+
         actor_location_x = self.entity.x
         actor_location_y = self.entity.y
         inventory = self.entity.inventory
 
-        for item in self.engine.game_map.items:
-            if actor_location_x == item.x and actor_location_y == item.y:
+        for item in self.engine.game_map.get_entities_at_location(actor_location_x, actor_location_y):
+            if isinstance(item, Item):
                 if len(inventory.items) >= inventory.capacity:
                     raise exceptions.Impossible("Your inventory is full.")
 
-                self.engine.game_map.entities.remove(item)
+                self.engine.game_map.remove_entity(item)
                 item.parent = self.entity.inventory
                 inventory.items.append(item)
 
@@ -144,23 +146,20 @@ class EnterSystemAction(Action):
                 for system in game_world.stellar_systems:
 
                     if (self.entity.x-system.x)**2 + (self.entity.y-system.y)**2 < (system.star.r+5)**2:
-                        self.engine.game_map = system.game_map
-
-                        self.entity.gamemap.entities.remove(self.entity)
-                        self.entity.parent = system.game_map
-                        self.entity.gamemap.entities.add(self.entity)
+                        self.engine.game_map = game_world.get_system_map(system)
+                        game_world.current_map = self.engine.game_map
 
                         self.entity.place(int(self.engine.game_map.width-10), int(self.engine.game_map.height/2), self.engine.game_map)
                         self.engine.message_log.add_message(
                             "You enter the system.", color.descend)
+                        break
             else:
-                self.engine.game_map = self.engine.game_world.main_map
+                game_world = self.engine.game_world
+                self.engine.game_map = game_world.load_map(game_world.main_map)
+                game_world.current_map = game_world.main_map
 
-                self.entity.gamemap.entities.remove(self.entity)
-                self.entity.parent = self.engine.game_world.main_map
-                self.entity.gamemap.entities.add(self.entity)
-                
                 self.entity.place(self.entity.global_map_x, self.entity.global_map_y, self.engine.game_map)
+                game_world.evict_system_maps()
                 #self.entity.place(int(self.engine.game_map.width-10), int(self.engine.game_map.height/2), space)
                 self.engine.message_log.add_message(
                     "You exit the system.", color.descend)
@@ -225,11 +224,8 @@ class MovementAction(ActionWithDirection):
         if not self.engine.game_map.in_bounds(dest_x, dest_y):
             # Destination is out of bounds.
             raise exceptions.Impossible("That way is blocked.")
-        if not self.engine.game_map.tiles["walkable"][dest_x, dest_y]:
-            # Destination is out of bounds.
-            raise exceptions.Impossible("That way is blocked.")
-        if self.engine.game_map.get_blocking_entity_at_location(dest_x, dest_y):
-            # Destination is out of bounds.
+        if not self.engine.game_map.is_passable(dest_x, dest_y):
+            # Destination is not walkable or blocked by an entity.
             raise exceptions.Impossible("That way is blocked.")
 
         self.entity.move(self.dx, self.dy)
@@ -0,0 +1,127 @@
+"""Periodic saves written in the background."""
+from __future__ import annotations
+
+import os
+import threading
+import time
+import traceback
+from typing import Optional, Tuple, TYPE_CHECKING
+
+import savefile
+from tracing import record
+
+if TYPE_CHECKING:
+    from engine import Engine
+
+
+class Autosaver:
+    """
+    Saves the game every `interval` turns without stalling the game loop.
+
+    Where `os.fork` exists the save is written by a forked child process, which works
+    on a copy-on-write snapshot of the whole game: the game only pauses for the fork.
+    Elsewhere the game state is serialized between two turns (`savefile.snapshot`)
+    and only compressed and written out on a background thread.
+
+    Only one autosave runs at a time; a save that comes due while the previous one
+    is still being written is skipped.
+    """
+
+    def __init__(self, filename: str, interval: int = 100, use_fork: Optional[bool] = None):
+        self.filename = filename
+        self.interval = interval
+        self.use_fork = hasattr(os, "fork") if use_fork is None else use_fork
+        self.last_report: Optional[savefile.SaveReport] = None
+
+        self._thread: Optional[threading.Thread] = None
+        self._child: Optional[Tuple[int, int, float]] = None  # pid, pipe, pause
+        self._finished: Optional[savefile.SaveReport] = None
+
+    @property
+    def busy(self) -> bool:
+        """True while an autosave is being written."""
+        self._collect(block=False)
+        return self._thread is not None or self._child is not None
+
+    def on_turn(self, engine: Engine) -> None:
+        """Start an autosave if one is due.  Called at the end of every player turn."""
+        self.poll()
+        if engine.index % self.interval == 0 and not self.busy:
+            self.start(engine)
+
+    def start(self, engine: Engine) -> None:
+        """Start writing a save of the game as it is now."""
+        if self.use_fork:
+            self._start_child(engine)
+        else:
+            self._start_thread(engine)
+
+    def _start_child(self, engine: Engine) -> None:
+        start = time.perf_counter()
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+
+        if pid == 0:
+            # Child process, write the save from our copy of the game and quit.
+            status = 1
+            try:
+                os.close(read_end)
+                write_start = time.perf_counter()
+                size = savefile.snapshot(engine).write(self.filename)
+                os.write(write_end, f"{size} {time.perf_counter() - write_start}".encode())
+                status = 0
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                os._exit(status)
+
+        os.close(write_end)
+        self._child = (pid, read_end, time.perf_counter() - start)
+        record("autosave.fork", "save", start, args={"pid": pid})
+
+    def _start_thread(self, engine: Engine) -> None:
+        start = time.perf_counter()
+        writer = savefile.snapshot(engine)
+        pause = time.perf_counter() - start
+        record("autosave.snapshot", "save", start, end=start + pause)
+
+        def write() -> None:
+            write_start = time.perf_counter()
+            size = writer.write(self.filename)
+            write_time = time.perf_counter() - write_start
+            record("autosave.write", "save", write_start, args={"size": size}, end=write_start + write_time)
+            self._finished = savefile.SaveReport(self.filename, size, pause, write_time)
+
+        self._thread = threading.Thread(target=write, name="autosave")
+        self._thread.start()
+
+    def _collect(self, block: bool) -> None:
+        """Clean up after the running autosave if it is done, or wait for it if `block`."""
+        if self._thread is not None and (block or not self._thread.is_alive()):
+            self._thread.join()
+            self._thread = None
+
+        if self._child is not None:
+            pid, read_end, pause = self._child
+            done, status = os.waitpid(pid, 0 if block else os.WNOHANG)
+            if done == 0:
+                return
+            self._child = None
+            with os.fdopen(read_end, "rb") as pipe:
+                result = pipe.read().split()
+            if status == 0 and result:
+                size, write_time = int(result[0]), float(result[1])
+                self._finished = savefile.SaveReport(self.filename, size, pause, write_time)
+
+    def poll(self) -> None:
+        """Report the autosave that finished since the last call, if any."""
+        self._collect(block=False)
+        report, self._finished = self._finished, None
+        if report is not None:
+            self.last_report = report
+            print(f"Game autosaved ({report}).")
+
+    def wait(self) -> None:
+        """Block until the running autosave, if any, is written."""
+        self._collect(block=True)
+        self.poll()
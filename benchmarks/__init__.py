@@ -0,0 +1,7 @@
+"""
+Performance benchmarks for the game.
+
+Run them from the repository root, e.g. `python -m benchmarks.bench_procgen`.
+`python -m benchmarks.suite` runs the seeded scenarios of the suite and checks
+them against the stored baseline.
+"""
@@ -0,0 +1,78 @@
+"""
+Measure the input-to-render latency of the game loop while autosaves run.
+
+Every frame handles one player action and renders the screen, as `main.main`
+does for a key press.  The galaxy is padded with extra ships to make saves
+expensive, and the frame times are compared without saves, with a synchronous
+`Engine.save_as` every `--interval` turns, and with the Autosaver writing from a
+thread and from a forked process:
+
+    python -m benchmarks.bench_autosave
+    python -m benchmarks.bench_autosave --ships 5000 --frames 400
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+from typing import List
+
+import tcod
+
+import actions
+from autosave import Autosaver
+from benchmarks.suite import make_engine
+import input_handlers
+
+
+def run(mode: str, ships: int, frames: int, interval: int, filename: str) -> List[float]:
+    """Return the duration of each frame in seconds."""
+    engine = make_engine(0, ships, spread=True)
+    handler = input_handlers.MainGameEventHandler(engine)
+    console = tcod.console.Console(80, 50, order="F")
+    if mode in ("thread", "fork"):
+        engine.autosaver = Autosaver(filename, interval, use_fork=mode == "fork")
+
+    timings = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        handler.handle_action(actions.WaitAction(engine.player))
+        if mode == "sync" and engine.index % interval == 0:
+            engine.save_as(filename)
+        console.clear()
+        handler.on_render(console)
+        timings.append(time.perf_counter() - start)
+
+    if engine.autosaver is not None:
+        engine.autosaver.wait()
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ships", type=int, default=2000)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--interval", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "autosave.sav")
+        modes = ["none", "sync", "thread"] + (["fork"] if hasattr(os, "fork") else [])
+        for mode in modes:
+            with contextlib.redirect_stdout(io.StringIO()):  # Silence the autosave reports.
+                timings = sorted(run(mode, args.ships, args.frames, args.interval, filename))
+            p95 = timings[int(len(timings) * 0.95)]
+            print(
+                f"{mode:>6} saves: median {statistics.median(timings)*1000:7.2f} ms, "
+                f"p95 {p95*1000:7.2f} ms, max {timings[-1]*1000:7.2f} ms per frame"
+            )
+            if mode != "none":
+                print(f"{'':>13}last save: {os.path.getsize(filename) / 1024:.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
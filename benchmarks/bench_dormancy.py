@@ -0,0 +1,52 @@
+"""
+Measure the cost of a turn with thousands of ships spread over the map.
+
+`--ships` hostile ships are spawned on random open tiles of the main map,
+most of them far out of the player's sight, and the player waits while the
+turns go by.  Idle ships far from the player are left dormant by the engine;
+`--awake` keeps every ship scheduled, as before actors could be dormant:
+
+    python -m benchmarks.bench_dormancy
+    python -m benchmarks.bench_dormancy --awake
+    python -m benchmarks.bench_dormancy --ships 10000 --turns 50
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+from benchmarks.suite import make_engine
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ships", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--awake", action="store_true", help="never leave ships dormant")
+    args = parser.parse_args()
+
+    engine = make_engine(0, args.ships, spread=True)
+    if args.awake:
+        engine.can_sleep = lambda actor: False
+    game_map = engine.game_map
+
+    timings = []
+    scheduled = []
+    for _ in range(args.turns):
+        start = time.perf_counter()
+        engine.main_turns_cycle()
+        engine.update_fov()
+        timings.append(time.perf_counter() - start)
+        scheduled.append(len(game_map.scheduler))
+
+    timings.sort()
+    print(
+        f"{'awake' if args.awake else 'dormancy'}: median {statistics.median(timings)*1000:7.2f} ms, "
+        f"p95 {timings[int(len(timings) * 0.95)]*1000:7.2f} ms per turn, "
+        f"{statistics.mean(scheduled):.0f} of {len(game_map.actors) - 1} ships scheduled on average"
+    )
+
+
+if __name__ == "__main__":
+    main()
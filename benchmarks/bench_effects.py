@@ -0,0 +1,73 @@
+"""
+Run an explosion-heavy fight and report the effect pool statistics per phase.
+
+The player shoots every turn, surrounded by hostile ships that shoot back.
+The player cannot die, and every ship destroyed, which explodes, is replaced
+by a new one, so the fight goes on at a constant intensity: once the pool has
+warmed up, every explosion comes from it and the `created` count stops
+growing.  (Lasers are rows of the map's ProjectileTable, not effects.)
+
+    python -m benchmarks.bench_effects
+    python -m benchmarks.bench_effects --ships 300 --phases 5
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.suite import make_engine
+import effects_factory
+import entity_factories
+import input_handlers
+from spawn_actions import ShootAction
+
+DIRECTIONS = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ships", type=int, default=100)
+    parser.add_argument("--phases", type=int, default=4)
+    parser.add_argument("--turns", type=int, default=100, help="turns per phase")
+    args = parser.parse_args()
+
+    engine = make_engine(0)
+    player = engine.player
+    game_map = engine.game_map
+    handler = input_handlers.MainGameEventHandler(engine)
+
+    rng = np.random.RandomState(1)
+
+    def reinforce() -> None:
+        while len(game_map.actors) < args.ships + 1:
+            x = player.x + rng.randint(-30, 31)
+            y = player.y + rng.randint(-18, 19)
+            if game_map.in_bounds(x, y) and game_map.is_passable(x, y):
+                entity_factories.spawn("skirmisher", game_map, x, y)
+
+    reinforce()
+
+    pool = effects_factory.pool
+    turn = 0
+    for phase in range(args.phases):
+        before = pool.stats()
+        start = time.perf_counter()
+        for _ in range(args.turns):
+            handler.handle_action(ShootAction(player, *DIRECTIONS[turn % 4]))
+            reinforce()
+            turn += 1
+        seconds = time.perf_counter() - start
+
+        stats = pool.stats()
+        spawned = stats["created"] + stats["reused"] - before["created"] - before["reused"]
+        print(
+            f"phase {phase}: {args.turns / seconds:6.1f} turns/s, {spawned:5d} effects spawned, "
+            f"{stats['created'] - before['created']:4d} created, "
+            f"{stats['free']:4d} free, {len(game_map.effects):4d} live"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Time the parallel build phase of galaxy generation against the worker count.
+
+Builds the terrain of N synthetic star systems with 1, 2, 4 and 8 worker
+processes and checks that every worker count produces the same tiles:
+
+    python -m benchmarks.bench_galaxy_workers
+    python -m benchmarks.bench_galaxy_workers --systems 20 100 500 --workers 1 4
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from components.stellar_system import StellarSystem, Star
+from procgen import build_star_systems_tiles, new_stellar_system
+
+MAP_WIDTH = 79*4
+MAP_HEIGHT = 43*2
+
+
+def make_systems(count: int) -> List[StellarSystem]:
+    """Place `count` systems with fixed seeds, as the placement phase would."""
+    np.random.seed(0)
+    return [
+        new_stellar_system(Star(0, 0, 0), seed=i, map_width=MAP_WIDTH, map_height=MAP_HEIGHT)
+        for i in range(count)
+    ]
+
+
+def build(systems: Sequence[StellarSystem], workers: int) -> Tuple[float, List[np.ndarray]]:
+    start = time.perf_counter()
+    layers = build_star_systems_tiles(systems, max_workers=workers)
+    return time.perf_counter() - start, layers
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--systems", type=int, nargs="+", default=[20, 100, 500])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for count in args.systems:
+        systems = make_systems(count)
+        reference = None
+        serial = None
+
+        for workers in args.workers:
+            runs = [build(systems, workers) for _ in range(args.repeat)]
+            timings = [seconds for seconds, _ in runs]
+            layers = runs[0][1]
+
+            if reference is None:
+                reference = layers
+            elif not all(np.array_equal(a, b) for a, b in zip(reference, layers)):
+                raise SystemExit(f"{count} systems: {workers} workers built different tiles")
+
+            median = statistics.median(timings)
+            if serial is None:
+                serial = median
+            print(
+                f"{count:4d} systems, {workers} workers: "
+                f"median {median*1000:8.1f} ms, speedup {serial/median:4.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Measure the memory taken per entity, with slots and with per-instance dicts.
+
+Spawns `--count` entities from the prototypes (ships with their fighter,
+inventory, equipment and gear, items and effects, in equal parts) and reports
+the bytes allocated per entity, components included.  The same entities are
+then rebuilt as plain objects that keep the same attributes in a __dict__,
+which is how these classes were laid out before they had __slots__, and
+measured the same way.  Attribute reads are timed on both:
+
+    python -m benchmarks.bench_memory
+    python -m benchmarks.bench_memory --count 20000
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+import effects_factory
+import entity_factories
+from slotted import Slotted
+
+PROTOTYPES = [
+    entity_factories.fighter,
+    entity_factories.skirmisher,
+    entity_factories.repair_kit,
+    entity_factories.dagger_laser,
+    effects_factory.laser_beam,
+]
+
+
+class DictLayout:
+    """A plain object holding the attributes of a slotted one in its __dict__."""
+
+
+def as_dict_layout(obj: Any, copies: Dict[int, Any]) -> Any:
+    """Rebuild `obj`, and the slotted objects it refers to, as DictLayout objects."""
+    if not isinstance(obj, Slotted):
+        if isinstance(obj, list):
+            return [as_dict_layout(item, copies) for item in obj]
+        return obj
+    copy = copies.get(id(obj))
+    if copy is None:
+        copy = copies[id(obj)] = DictLayout()
+        copy.__dict__.update(
+            (name, as_dict_layout(value, copies)) for name, value in obj.__getstate__().items()
+        )
+    return copy
+
+
+def measure(build: Callable[[], List[Any]]) -> tuple:
+    """Return what `build` returns and the bytes it allocated."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, size
+
+
+def read_time(entities: List[Any]) -> float:
+    """Time a pass reading the attributes the game loop reads the most."""
+    start = time.perf_counter()
+    for entity in entities:
+        entity.x, entity.y, entity.char, entity.color, entity.render_order
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=100_000)
+    args = parser.parse_args()
+
+    count = args.count
+    slotted, slotted_size = measure(
+        lambda: [PROTOTYPES[i % len(PROTOTYPES)].clone() for i in range(count)]
+    )
+    # Entities share no slotted objects, so each gets a copy table of its own.
+    dicts, dict_size = measure(lambda: [as_dict_layout(entity, {}) for entity in slotted])
+
+    for layout, entities, size in (("dicts", dicts, dict_size), ("slots", slotted, slotted_size)):
+        print(
+            f"{layout}: {size / count:6.0f} bytes per entity, {size / 2**20:6.1f} MiB for {count}, "
+            f"attribute reads {read_time(entities) * 1e9 / count:5.1f} ns per entity"
+        )
+
+
+if __name__ == "__main__":
+    main()
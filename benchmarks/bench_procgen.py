@@ -0,0 +1,98 @@
+"""
+Time galaxy generation (`GameWorld.generate_galaxy`).
+
+The `--legacy-masks` flag swaps the star and planet masks back to the
+per-tile Python loops they used to be built with, to show the speedup of
+the vectorized masks:
+
+    python -m benchmarks.bench_procgen
+    python -m benchmarks.bench_procgen --legacy-masks
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from components.stellar_system import Planet, Star
+from engine import Engine
+import entity_factories
+from game_map import GameWorld
+import procgen
+
+
+def _legacy_ring(map_width, map_height, x, y, r_outer, r_inner=None):
+    area = np.full((map_width, map_height), False, order='F')
+    for i in range(map_width):
+        for j in range(map_height):
+            d2 = (i-x)**2 + (j-y)**2
+            if d2 < r_outer**2 and (r_inner is None or r_inner**2 < d2):
+                area[i,j] = True
+    return area
+
+
+def _legacy_facing_star(self, map_width, map_height):
+    star = self.parent.star
+    dist2 = (star.x - self.x)**2 + (star.y - self.y)**2
+    area = np.full((map_width, map_height), False, order='F')
+    for i in range(map_width):
+        for j in range(map_height):
+            if (i-star.x)**2 + (j-star.y)**2 < dist2 \
+               and (i-self.x)**2 + (j-self.y)**2 < self.r**2:
+                area[i,j] = True
+    return area
+
+
+def use_legacy_masks() -> None:
+    Planet.inner = lambda self, w, h: _legacy_ring(w, h, self.x, self.y, self.r)
+    Planet.facing_star = _legacy_facing_star
+    Star.inner = lambda self, w, h, rad=None: _legacy_ring(
+        w, h, self.x, self.y, self.r if rad is None else rad
+    )
+    Star.outter = lambda self, w, h, rad=None: _legacy_ring(
+        w, h, self.x, self.y, self.r+2 if rad is None else rad, self.r-1
+    )
+    procgen.ring_mask = _legacy_ring
+
+
+def generate_galaxy(seed: int) -> float:
+    """Generate a galaxy with the new game settings and return the seconds it took."""
+    np.random.seed(seed)
+    engine = Engine(player=entity_factories.player.clone())
+    engine.game_world = GameWorld(
+        engine=engine,
+        map_window_width=79,
+        map_window_height=43,
+        map_width=79*3,
+        map_height=43*3,
+        max_monsters=6,
+        min_monsters=3,
+        max_items=1,
+    )
+
+    start = time.perf_counter()
+    engine.game_world.generate_galaxy()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--legacy-masks", action="store_true")
+    args = parser.parse_args()
+
+    if args.legacy_masks:
+        use_legacy_masks()
+
+    timings = [generate_galaxy(seed) for seed in range(args.repeat)]
+    print(
+        f"generate_galaxy ({'legacy' if args.legacy_masks else 'vectorized'} masks): "
+        f"median {statistics.median(timings)*1000:.1f} ms, "
+        f"min {min(timings)*1000:.1f} ms over {args.repeat} runs"
+    )
+
+
+if __name__ == "__main__":
+    main()
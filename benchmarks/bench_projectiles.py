@@ -0,0 +1,74 @@
+"""
+Measure the cost of a turn with thousands of lasers in flight.
+
+Every turn `--shots` lasers are fired from random open tiles in random
+directions, on a galaxy padded with `--ships` immobile targets.  The lasers
+are moved by the map's ProjectileTable, or with `--legacy` spawned as laser
+beam Effects that take their turns through the scheduler one step at a time,
+as they did before the table existed:
+
+    python -m benchmarks.bench_projectiles
+    python -m benchmarks.bench_projectiles --legacy
+    python -m benchmarks.bench_projectiles --shots 1000 --turns 50
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from benchmarks.suite import make_engine
+import effects_factory
+
+DIRECTIONS = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--shots", type=int, default=200, help="lasers fired per turn")
+    parser.add_argument("--ships", type=int, default=500)
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--legacy", action="store_true", help="fly the lasers as Effect entities")
+    args = parser.parse_args()
+
+    engine = make_engine(0, args.ships, spread=True)
+    game_map = engine.game_map
+    player = engine.player
+    for ship in game_map.actors:
+        if ship is not player:  # Immobile targets that last.
+            ship.fighter.max_hp = ship.fighter.hp = 10**9
+            ship.speed = 0
+
+    rng = np.random.RandomState(1)
+
+    open_x, open_y = np.nonzero(game_map.tiles["walkable"])
+    timings = []
+    in_flight = []
+    for _ in range(args.turns):
+        picks = rng.randint(len(open_x), size=args.shots)
+        directions = rng.randint(len(DIRECTIONS), size=args.shots)
+
+        start = time.perf_counter()
+        for x, y, direction in zip(open_x[picks].tolist(), open_y[picks].tolist(), directions.tolist()):
+            vx, vy = DIRECTIONS[direction]
+            if args.legacy:
+                laser = effects_factory.spawn("laser_beam", game_map, x, y)
+                laser.vx, laser.vy, laser.origin = vx, vy, player
+            else:
+                game_map.projectiles.fire(player, x, y, vx, vy)
+        engine.main_turns_cycle()
+        timings.append(time.perf_counter() - start)
+        in_flight.append(len(game_map.effects) if args.legacy else len(game_map.projectiles))
+
+    timings.sort()
+    print(
+        f"{'effects' if args.legacy else 'table'}: median {statistics.median(timings)*1000:7.2f} ms, "
+        f"p95 {timings[int(len(timings) * 0.95)]*1000:7.2f} ms per turn, "
+        f"{statistics.mean(in_flight):.0f} lasers in flight on average"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Measure spawn throughput: `Entity.spawn` through the prototype `clone` methods
+against the `copy.deepcopy` of the prototype it used to do.
+
+    python -m benchmarks.bench_spawn
+    python -m benchmarks.bench_spawn --count 20000
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import time
+
+import numpy as np
+
+from engine import Engine
+import effects_factory
+import entity_factories
+from game_map import GameMap
+
+
+def deepcopy_spawn(prototype, gamemap, x, y):
+    clone = copy.deepcopy(prototype)
+    clone.x = x
+    clone.y = y
+    clone.parent = gamemap
+    gamemap.add_entity(clone)
+    return clone
+
+
+def measure(prototype, count: int, spawn) -> float:
+    """Return the spawns per second of `spawn` on a fresh map."""
+    engine = Engine(player=entity_factories.player.clone())
+    gamemap = GameMap(engine, 200, 200, 79, 43, rng=np.random.RandomState(0))
+    engine.game_map = gamemap
+    positions = np.random.RandomState(1).randint(0, 200, size=(count, 2)).tolist()
+
+    start = time.perf_counter()
+    for x, y in positions:
+        spawn(prototype, gamemap, x, y)
+    return count / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=5000)
+    args = parser.parse_args()
+
+    prototypes = {**entity_factories.prototypes, **effects_factory.prototypes}
+    for name, prototype in prototypes.items():
+        cloned = measure(prototype, args.count, lambda p, m, x, y: p.spawn(m, x, y))
+        deep = measure(prototype, args.count, deepcopy_spawn)
+        print(
+            f"{name:>24}: clone {cloned:9.0f}/s, deepcopy {deep:9.0f}/s, "
+            f"speedup {cloned / deep:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Run the benchmark suite and check it against the stored baseline.
+
+Every scenario is set up from a fixed seed, run once to warm up, then timed
+`repeat` times; one more run is traced for its peak memory.  The results go
+to stdout as JSON (median and p95 times in milliseconds, peak memory in KiB),
+and are compared with `benchmarks/baseline.json`: the suite fails if a median
+time or a peak memory grew by more than `--threshold` (25% by default).
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --only "turn_cycle.*" --threshold 0.5
+    python -m benchmarks.suite --save-baseline
+
+The baseline only means something on the machine it was recorded on: record
+it again with `--save-baseline` after changing machines.
+"""
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import tcod
+
+from engine import Engine
+import entity_factories
+import headless
+import procgen
+import setup_game
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Differences smaller than these are noise, whatever the threshold.
+MIN_TIME_DELTA_MS = 0.05
+MIN_MEMORY_DELTA_KIB = 64
+
+
+class Scenario:
+    """An operation to time: `setup(seed, directory)` builds the state `run(state)` works on."""
+
+    def __init__(
+        self, name: str, setup: Callable[[int, str], Any], run: Callable[[Any], Any], repeat: int,
+    ):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.repeat = repeat
+
+
+def seed_all(seed: int) -> None:
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def make_engine(seed: int, ships: int = 0, spread: bool = False) -> Engine:
+    """
+    A new game with `ships` hostile ships around the player, or anywhere on the
+    map if `spread`.  The player cannot die, and nothing is written to disk: no
+    autosaves, no message archive.  Shared by the benchmarks of this package.
+    """
+    seed_all(seed)
+    engine = setup_game.new_game()
+    engine.autosaver = None
+    engine.message_log.archive = None
+    engine.player.fighter.max_hp = engine.player.fighter.hp = 10**9
+    if spread:
+        add_ships_anywhere(engine, ships, random.Random(seed))
+    else:
+        headless.add_ships(engine, ships, random.Random(seed))
+    return engine
+
+
+def add_ships_anywhere(engine: Engine, count: int, rng: random.Random) -> None:
+    """Spawn `count` hostile ships on random open tiles of the whole map."""
+    game_map = engine.game_map
+    added = 0
+    while added < count:
+        x, y = rng.randrange(game_map.width), rng.randrange(game_map.height)
+        if game_map.is_passable(x, y):
+            entity_factories.spawn(rng.choice(["skirmisher", "fighter"]), game_map, x, y)
+            added += 1
+
+
+def setup_generate_space(seed: int, directory: str) -> Engine:
+    seed_all(seed)
+    return Engine(player=entity_factories.player.clone())
+
+
+def run_generate_space(engine: Engine) -> None:
+    procgen.generate_space(
+        map_width=79 * 3,
+        map_height=43 * 3,
+        engine=engine,
+        max_monsters=6,
+        min_monsters=3,
+        max_items=1,
+        map_window_width=79,
+        map_window_height=43,
+    )
+
+
+def run_generate_star_system(engine: Engine) -> None:
+    procgen.generate_star_system(
+        engine=engine,
+        window_width=79,
+        window_height=43,
+        stellar_system=engine.game_world.stellar_systems[0],
+    )
+
+
+def run_update_fov(engine: Engine) -> None:
+    engine._fov_key = None  # Compute the field of view again.
+    engine.update_fov()
+
+
+def setup_render(seed: int, directory: str) -> tuple:
+    return make_engine(seed, 100), tcod.console.Console(80, 50, order="F")
+
+
+def run_render(state: tuple) -> None:
+    engine, console = state
+    console.clear()
+    engine.game_map.render(console)
+
+
+def setup_save(seed: int, directory: str) -> tuple:
+    return make_engine(seed, 100), os.path.join(directory, "save.sav")
+
+
+def setup_load(seed: int, directory: str) -> str:
+    engine, filename = setup_save(seed, directory)
+    engine.save_as(filename)
+    return filename
+
+
+SCENARIOS = [
+    Scenario("procgen.generate_space", setup_generate_space, run_generate_space, repeat=10),
+    Scenario("procgen.generate_star_system", lambda seed, _: make_engine(seed), run_generate_star_system, repeat=10),
+    *(
+        Scenario(
+            f"turn_cycle.{ships}",
+            lambda seed, _, ships=ships: make_engine(seed, ships),
+            Engine.main_turns_cycle,
+            repeat=50 if ships < 1000 else 20,
+        )
+        for ships in (10, 100, 1000)
+    ),
+    Scenario("update_fov", lambda seed, _: make_engine(seed), run_update_fov, repeat=100),
+    Scenario("render", setup_render, run_render, repeat=100),
+    Scenario("save_as", setup_save, lambda state: state[0].save_as(state[1]), repeat=20),
+    Scenario("load_game", setup_load, setup_game.load_game, repeat=20),
+]
+
+
+def measure(scenario: Scenario, seed: int, directory: str, repeat: Optional[int] = None) -> Dict[str, float]:
+    state = scenario.setup(seed, directory)
+    scenario.run(state)  # Warm up.
+
+    timings = []
+    for _ in range(repeat or scenario.repeat):
+        start = time.perf_counter()
+        scenario.run(state)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+
+    # Traced apart from the timed runs, tracing slows everything down.
+    tracemalloc.start()
+    scenario.run(state)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "repeat": len(timings),
+        "median_ms": statistics.median(timings) * 1000,
+        "p95_ms": timings[math.ceil(len(timings) * 0.95) - 1] * 1000,
+        "peak_kib": peak / 1024,
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    """Return a description of every regression of `results` over `baseline`."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for key, unit, min_delta in (("median_ms", "ms", MIN_TIME_DELTA_MS), ("peak_kib", "KiB", MIN_MEMORY_DELTA_KIB)):
+            if result[key] > base[key] * (1 + threshold) and result[key] - base[key] > min_delta:
+                regressions.append(
+                    f"{name}: {key} {result[key]:.2f} {unit} against {base[key]:.2f} {unit} "
+                    f"(+{(result[key] / base[key] - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--only", metavar="PATTERN", help="run the scenarios matching this glob")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, help="timed runs per scenario, instead of their own count")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed growth, as a fraction")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the baseline")
+    args = parser.parse_args()
+
+    scenarios = [s for s in SCENARIOS if args.only is None or fnmatch.fnmatch(s.name, args.only)]
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for scenario in scenarios:
+            result = results[scenario.name] = measure(scenario, args.seed, directory, args.repeat)
+            print(
+                f"{scenario.name:<30} median {result['median_ms']:9.2f} ms, p95 {result['p95_ms']:9.2f} ms, "
+                f"peak {result['peak_kib']:9.1f} KiB",
+                file=sys.stderr,
+            )
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "seed": args.seed,
+        "scenarios": results,
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"Baseline saved to {args.baseline}.", file=sys.stderr)
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, nothing to compare with.", file=sys.stderr)
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)["scenarios"]
+    regressions = compare(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+    print(f"No regression over {args.threshold:.0%} against {args.baseline}.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
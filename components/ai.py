@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import random
+import time
 from typing import List, Optional, Tuple, TYPE_CHECKING
 
 import numpy as np  # type: ignore
@@ -9,6 +10,7 @@ import tcod
 from actions import Action, BumpAction, MeleeAction, MovementAction, WaitAction
 from spawn_actions import ExplodeAction, ShootAction
 import exceptions
+from tracing import record, tracer
 
 
 if TYPE_CHECKING:
@@ -23,22 +25,43 @@ class BaseAI(Action):
     def choose_next_action(self) -> Action:
         raise NotImplementedError()
 
+    def clone(self, entity: Actor) -> BaseAI:
+        """Return a fresh AI of the same kind for a cloned actor."""
+        return type(self)(entity)
+
+    def is_idle(self) -> bool:
+        """
+        Return True if the entity is only waiting, and will keep waiting for as long
+        as the player is far away and nothing happens to it.  Idle actors far from the
+        player are left dormant, see `GameMap.sleep`.
+        """
+        return False
+
     def get_path_to(self, dest_x: int, dest_y: int) -> List[Tuple[int, int]]:
         """Compute and return a path to the target position.
 
         If there is no valid path then returns an empty list.
         """
-        # Copy the walkable array.
-        cost = np.array(self.entity.gamemap.tiles["walkable"], dtype=np.int8)
-
-        for entity in self.entity.gamemap.entities:
-            # Check that an enitiy blocks movement and the cost isn't zero (blocking.)
-            if entity.blocks_movement and cost[entity.x, entity.y]:
-                # Add to the cost of a blocked position.
-                # A lower number means more enemies will crowd behind each other in
-                # hallways.  A higher number means enemies will take longer paths in
-                # order to surround the player.
-                cost[entity.x, entity.y] += 10
+        traced = tracer.enabled
+        if traced:
+            start = time.perf_counter()
+        engine = self.engine
+        player = engine.player
+        if (dest_x, dest_y) == (player.x, player.y) and self.entity.gamemap is engine.game_map:
+            # Descend the distance field towards the player shared by all hostiles,
+            # unless the entity is out of it.
+            distance = engine.get_player_distance_field()
+            if distance[self.entity.x, self.entity.y] != np.iinfo(distance.dtype).max:
+                steps = self.descend(distance)
+                if traced:
+                    record("get_path_to", "path", start, args={"entity": self.entity.name, "field": True})
+                return steps
+
+        # The map keeps its path cost grid up to date: blocked positions cost extra.
+        # A lower number means more enemies will crowd behind each other in
+        # hallways.  A higher number means enemies will take longer paths in
+        # order to surround the player.
+        cost = self.entity.gamemap.path_cost
 
         # Create a graph from the cost array and pass that graph to a new pathfinder.
         graph = tcod.path.SimpleGraph(cost=cost, cardinal=2, diagonal=3)
@@ -48,11 +71,43 @@ class BaseAI(Action):
 
         # Compute the path to the destination and remove the starting point.
         path: List[List[int]] = pathfinder.path_to((dest_x, dest_y))[1:].tolist()
+        if traced:
+            record("get_path_to", "path", start, args={"entity": self.entity.name, "field": False})
 
         # Convert from List[List[int]] to List[Tuple[int, int]].
         return [(index[0], index[1]) for index in path]
 
 
+    def descend(self, distance: np.ndarray) -> List[Tuple[int, int]]:
+        """Return the path down the `distance` field from the entity.
+
+        The field only knows about the terrain.  If the first step is held by
+        another ship, the path starts from the free neighbour lowest in the field
+        instead, as long as it is lower than the entity's tile.
+        """
+        game_map = self.entity.gamemap
+        x, y = self.entity.x, self.entity.y
+        path: List[List[int]] = tcod.path.hillclimb2d(
+            distance, (x, y), cardinal=True, diagonal=True
+        )[1:].tolist()
+
+        if path and distance[path[0][0], path[0][1]] != 0 and not game_map.is_passable(*path[0]):
+            steps = [
+                (distance[x + dx, y + dy], x + dx, y + dy)
+                for dx in (-1, 0, 1)
+                for dy in (-1, 0, 1)
+                if (dx or dy) and game_map.in_bounds(x + dx, y + dy) and game_map.is_passable(x + dx, y + dy)
+            ]
+            if steps:
+                step_distance, step_x, step_y = min(steps)
+                if step_distance < distance[x, y]:
+                    path = tcod.path.hillclimb2d(
+                        distance, (step_x, step_y), cardinal=True, diagonal=True
+                    ).tolist()
+
+        return [(index[0], index[1]) for index in path]
+
+
 class HostileEnemy(BaseAI):
     def __init__(self, entity: Actor):
         super().__init__(entity)
@@ -66,6 +121,13 @@ class HostileEnemy(BaseAI):
         distance = max(abs(dx), abs(dy))  # Chebyshev distance.
         return distance
 
+    def is_idle(self) -> bool:
+        # Waits until it is in sight.
+        return (
+            isinstance(self.entity.stored_action, WaitAction)
+            and not self.engine.game_map.visible[self.entity.x, self.entity.y]
+        )
+
     def perform(self) -> None:
         target = self.engine.player
 
@@ -249,6 +311,10 @@ class HostileEnemyRanged(HostileEnemy):
 
 class HostileEnemyMelee(HostileEnemy):
 
+    def is_idle(self) -> bool:
+        # Out of sight, it follows the last path it had to the player.
+        return not self.path and super().is_idle()
+
     def perform(self) -> None:
         target = self.engine.player
         distance = self.distance_to_player
@@ -304,6 +370,10 @@ class ConfusedEnemy(BaseAI):
         self.previous_ai = previous_ai
         self.turns_remaining = turns_remaining
 
+    def clone(self, entity: Actor) -> ConfusedEnemy:
+        previous_ai = self.previous_ai.clone(entity) if self.previous_ai else None
+        return ConfusedEnemy(entity, previous_ai, self.turns_remaining)
+
     def choose_next_action(self) -> Action:
         # Revert the AI back to the original state if the effect has run its course.
         if self.turns_remaining <= 0:
@@ -1,14 +1,21 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+import copy
+from typing import TypeVar, TYPE_CHECKING
+
+from slotted import Slotted
 
 if TYPE_CHECKING:
     from engine import Engine
     from entity import Entity
     from game_map import GameMap
 
+C = TypeVar("C", bound="BaseComponent")
+
+
+class BaseComponent(Slotted):
+    __slots__ = ("parent",)
 
-class BaseComponent:
     parent: Entity  # Owning entity instance.
 
     @property
@@ -17,4 +24,12 @@ class BaseComponent:
 
     @property
     def engine(self) -> Engine:
-        return self.gamemap.engine
\ No newline at end of file
+        return self.gamemap.engine
+
+    def clone(self: C) -> C:
+        """
+        Return a copy of this component for a cloned entity, which sets its parent.
+
+        The copy is shallow: components holding more than plain values override this.
+        """
+        return copy.copy(self)
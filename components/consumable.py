@@ -15,6 +15,8 @@ if TYPE_CHECKING:
 
 
 class Consumable(BaseComponent):
+    __slots__ = ()
+
     parent: Item
 
     def get_action(self, consumer: Actor) -> Optional[ActionOrHandler]:
@@ -37,6 +39,8 @@ class Consumable(BaseComponent):
 
 
 class ConfusionConsumable(Consumable):
+    __slots__ = ("number_of_turns",)
+
     def __init__(self, number_of_turns: int):
         self.number_of_turns = number_of_turns
 
@@ -71,6 +75,8 @@ class ConfusionConsumable(Consumable):
 
 
 class HealingConsumable(Consumable):
+    __slots__ = ("amount",)
+
     def __init__(self, amount: int):
         self.amount = amount
 
@@ -89,6 +95,8 @@ class HealingConsumable(Consumable):
 
 
 class LightningDamageConsumable(Consumable):
+    __slots__ = ("damage", "maximum_range")
+
     def __init__(self, damage: int, maximum_range: int):
         self.damage = damage
         self.maximum_range = maximum_range
@@ -97,8 +105,15 @@ class LightningDamageConsumable(Consumable):
         consumer = action.entity
         target = None
         closest_distance = self.maximum_range + 1.0
+        game_map = self.engine.game_map
 
-        for actor in self.engine.game_map.actors:
+        nearby = game_map.get_actors_in_area(
+            consumer.x - self.maximum_range,
+            consumer.y - self.maximum_range,
+            consumer.x + self.maximum_range + 1,
+            consumer.y + self.maximum_range + 1,
+        )
+        for actor in nearby:
             if actor is not consumer and self.parent.gamemap.visible[actor.x, actor.y]:
                 distance = consumer.distance(actor.x, actor.y)
 
@@ -117,6 +132,8 @@ class LightningDamageConsumable(Consumable):
 
 
 class FireballDamageConsumable(Consumable):
+    __slots__ = ("damage", "radius")
+
     def __init__(self, damage: int, radius: int):
         self.damage = damage
         self.radius = radius
@@ -138,7 +155,13 @@ class FireballDamageConsumable(Consumable):
             raise Impossible("You cannot target an area that you cannot see.")
 
         targets_hit = False
-        for actor in self.engine.game_map.actors:
+        game_map = self.engine.game_map
+        x, y = target_xy
+
+        nearby = list(game_map.get_actors_in_area(
+            x - self.radius, y - self.radius, x + self.radius + 1, y + self.radius + 1,
+        ))
+        for actor in nearby:
             if actor.distance(*target_xy) <= self.radius:
                 self.engine.message_log.add_message(
                     f"The {actor.name} is engulfed in a fiery explosion, taking {self.damage} damage!"
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Optional, TYPE_CHECKING
+from typing import Dict, Optional, TYPE_CHECKING
 
 from components.base_component import BaseComponent
 from equipment_types import EquipmentType
@@ -10,12 +10,28 @@ if TYPE_CHECKING:
 
 
 class Equipment(BaseComponent):
+    __slots__ = ("weapon", "armor")
+
     parent: Actor
 
     def __init__(self, weapon: Optional[Item] = None, armor: Optional[Item] = None):
         self.weapon = weapon
         self.armor = armor
 
+    def clone(self, cloned_items: Dict[Item, Item]) -> Equipment:
+        """
+        Return a copy of this equipment for a cloned actor.
+
+        `cloned_items` maps the items of the original inventory to their clones, the
+        clone then equips its own copies.
+        """
+        def clone_item(item: Optional[Item]) -> Optional[Item]:
+            if item is None:
+                return None
+            return cloned_items.get(item) or item.clone()
+
+        return Equipment(weapon=clone_item(self.weapon), armor=clone_item(self.armor))
+
     @property
     def defense_bonus(self) -> int:
         bonus = 0
@@ -72,6 +88,7 @@ class Equipment(BaseComponent):
             self.unequip_from_slot(slot, add_message)
 
         setattr(self, slot, item)
+        self.parent.fighter.invalidate_stats()
 
         if add_message:
             self.equip_message(item.name)
@@ -83,6 +100,7 @@ class Equipment(BaseComponent):
             self.unequip_message(current_item.name)
 
         setattr(self, slot, None)
+        self.parent.fighter.invalidate_stats()
 
     def toggle_equip(self, equippable_item: Item, add_message: bool = True) -> None:
         if (
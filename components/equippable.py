@@ -10,6 +10,8 @@ if TYPE_CHECKING:
 
 
 class Equippable(BaseComponent):
+    __slots__ = ("equipment_type", "power_bonus", "defense_bonus", "mass_bonus")
+
     parent: Item
 
     def __init__(
@@ -27,20 +29,28 @@ class Equippable(BaseComponent):
 
 
 class DaggerClassLaser(Equippable):
+    __slots__ = ()
+
     def __init__(self) -> None:
         super().__init__(equipment_type=EquipmentType.WEAPON, power_bonus=2)
 
 
 class SwordClassLaser(Equippable):
+    __slots__ = ()
+
     def __init__(self) -> None:
         super().__init__(equipment_type=EquipmentType.WEAPON, power_bonus=4)
 
 
 class BasicArmor(Equippable):
+    __slots__ = ()
+
     def __init__(self) -> None:
         super().__init__(equipment_type=EquipmentType.ARMOR, defense_bonus=1)
 
 
 class DeflectorShieldsArmor(Equippable):
+    __slots__ = ()
+
     def __init__(self) -> None:
         super().__init__(equipment_type=EquipmentType.ARMOR, defense_bonus=3)
\ No newline at end of file
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+from typing import List, Optional, Tuple, TYPE_CHECKING
 
 import color
 from components.base_component import BaseComponent
 from render_order import RenderOrder
+from slotted import Slotted
 from components.ai import ExplodingAI
 import numpy as np
 
@@ -12,7 +13,33 @@ if TYPE_CHECKING:
     from entity import Actor
 
 
+class Modifier(Slotted):
+    """
+    A change to one of a fighter's stats, "power", "defense" or "mass", for as long
+    as it is on the fighter's modifier stack.  Meant for buffs and status effects.
+    """
+
+    __slots__ = ("stat", "amount", "source")
+
+    def __init__(self, stat: str, amount: int, source: str = ""):
+        self.stat = stat
+        self.amount = amount
+        self.source = source  # What the modifier comes from, for display.
+
+
 class Fighter(BaseComponent):
+    """
+    Hit points and combat stats.
+
+    The effective power, defense and mass (base value, equipment bonus and
+    modifiers) are computed once and cached.  The cache is dropped by
+    `invalidate_stats`, which Equipment calls on every equip and unequip and
+    `add_modifier`/`remove_modifier` call on every change to the modifier stack;
+    anything else changing a base stat must call it too.
+    """
+
+    __slots__ = ("max_hp", "_hp", "base_defense", "base_power", "base_mass", "modifiers", "_stats")
+
     parent: Actor
 
     def __init__(self, hp: int, base_defense: int, base_power: int, base_mass: int):
@@ -21,6 +48,25 @@ class Fighter(BaseComponent):
         self.base_defense = base_defense
         self.base_power = base_power
         self.base_mass = base_mass
+        self.modifiers: List[Modifier] = []
+        self._stats: Optional[Tuple[int, int, int]] = None  # power, defense, mass
+
+    def __getstate__(self) -> dict:
+        state = super().__getstate__()
+        state.pop("_stats", None)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        super().__setstate__(state)
+        self._stats = None
+        if "modifiers" not in state:  # Saved before modifiers existed.
+            self.modifiers = []
+
+    def clone(self) -> Fighter:
+        clone = super().clone()
+        clone.modifiers = list(self.modifiers)
+        clone._stats = None
+        return clone
 
     @property
     def hp(self) -> int:
@@ -28,42 +74,66 @@ class Fighter(BaseComponent):
 
     @hp.setter
     def hp(self, value: int) -> None:
+        if value < self._hp and self.parent.ai:
+            self.gamemap.wake(self.parent)  # Dormant actors wake up when hurt.
         self._hp = max(0, min(value, self.max_hp))
         if self._hp == 0 and self.parent.ai:
             self.die()
 
     @property
-    def defense(self) -> int:
-        return self.base_defense + self.defense_bonus
+    def power(self) -> int:
+        return (self._stats or self._update_stats())[0]
 
     @property
-    def power(self) -> int:
-        return self.base_power + self.power_bonus
+    def defense(self) -> int:
+        return (self._stats or self._update_stats())[1]
 
     @property
     def mass(self) -> int:
-        return self.base_mass + self.mass_bonus
+        return (self._stats or self._update_stats())[2]
 
     @property
     def defense_bonus(self) -> int:
-        if self.parent.equipment:
-            return self.parent.equipment.defense_bonus
-        else:
-            return 0
+        return self.defense - self.base_defense
 
     @property
     def power_bonus(self) -> int:
-        if self.parent.equipment:
-            return self.parent.equipment.power_bonus
-        else:
-            return 0
+        return self.power - self.base_power
 
     @property
     def mass_bonus(self) -> int:
-        if self.parent.equipment:
-            return self.parent.equipment.mass_bonus
-        else:
-            return 0
+        return self.mass - self.base_mass
+
+    def _update_stats(self) -> Tuple[int, int, int]:
+        bonus = {"power": 0, "defense": 0, "mass": 0}
+
+        equipment = self.parent.equipment
+        if equipment:
+            bonus["power"] += equipment.power_bonus
+            bonus["defense"] += equipment.defense_bonus
+            bonus["mass"] += equipment.mass_bonus
+
+        for modifier in self.modifiers:
+            bonus[modifier.stat] += modifier.amount
+
+        self._stats = (
+            self.base_power + bonus["power"],
+            self.base_defense + bonus["defense"],
+            self.base_mass + bonus["mass"],
+        )
+        return self._stats
+
+    def invalidate_stats(self) -> None:
+        """Recompute the effective stats on their next read."""
+        self._stats = None
+
+    def add_modifier(self, modifier: Modifier) -> None:
+        self.modifiers.append(modifier)
+        self.invalidate_stats()
+
+    def remove_modifier(self, modifier: Modifier) -> None:
+        self.modifiers.remove(modifier)
+        self.invalidate_stats()
 
     def heal(self, amount: int) -> int:
         if self.hp == self.max_hp:
@@ -102,5 +172,6 @@ class Fighter(BaseComponent):
             self.parent.ai = None
         self.parent.name = f"remains of {self.parent.name}"
         self.parent.render_order = RenderOrder.CORPSE
+        self.gamemap.refresh_entity(self.parent)
 
         self.engine.message_log.add_message(death_message, death_message_color)
\ No newline at end of file
@@ -9,6 +9,8 @@ if TYPE_CHECKING:
 
 
 class Inventory(BaseComponent):
+    __slots__ = ("capacity", "items")
+
     parent: Actor
 
     def __init__(self, capacity: int):
@@ -24,6 +26,12 @@ class Inventory(BaseComponent):
 
         self.engine.message_log.add_message(f"You dropped the {item.name}.")
 
+    def clone(self) -> Inventory:
+        clone = Inventory(self.capacity)
+        for item in self.items:
+            clone.add(item.clone())
+        return clone
+
     def add(self, item: Item) -> None:
         """
         Adds an item to the inventory 
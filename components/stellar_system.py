@@ -1,25 +1,72 @@
 from __future__ import annotations
 
-from typing import Iterable, Tuple
+from typing import Iterable, Optional, Tuple
 import numpy as np
-from game_map import GameMap
 import tile_types
 
 
+# Random streams of a StellarSystem seed, one per generation step.
+PLANETS_STREAM = 0
+TERRAIN_STREAM = 1
+
+
+def ring_mask(
+    map_width: int, 
+    map_height: int, 
+    x: int, 
+    y: int, 
+    r_outer: float, 
+    r_inner: Optional[float] = None,
+) -> np.ndarray:
+    """
+    Return a map sized boolean mask of the tiles with r_inner**2 < d**2 < r_outer**2,
+    where d is the distance to (x, y).  Without r_inner this is a filled disk.
+
+    Only the bounding box of the circle is evaluated, using broadcast distance grids.
+    """
+    area = np.full((map_width, map_height), False, order='F')
+
+    reach = int(np.ceil(r_outer))
+    x_low, x_high = max(int(x) - reach, 0), min(int(x) + reach + 1, map_width)
+    y_low, y_high = max(int(y) - reach, 0), min(int(y) + reach + 1, map_height)
+    if x_low >= x_high or y_low >= y_high:
+        return area
+
+    dx = np.arange(x_low, x_high)[:, np.newaxis] - x
+    dy = np.arange(y_low, y_high)[np.newaxis, :] - y
+    dist2 = dx**2 + dy**2
+
+    stamp = dist2 < r_outer**2
+    if r_inner is not None:
+        stamp &= r_inner**2 < dist2
+
+    area[x_low:x_high, y_low:y_high] = stamp
+    return area
+
+
 class StellarSystem:
-    def __init__(self, x: int, y: int, star: Star, planets: Iterable[Planet] = [], 
-        game_map: GameMap = None):
+    """
+    A star system on the galaxy map.
+
+    Its own GameMap is not stored here: GameWorld builds it on demand from `seed`,
+    and can throw it away and rebuild an identical one later.
+    """
+
+    def __init__(self, x: int, y: int, star: Star, seed: int, map_width: int, map_height: int,
+        planets: Iterable[Planet] = []):
         self.x = x
         self.y = y
 
         self.star = star
         self.star.parent = self
 
+        self.seed = seed
+        self.map_width = map_width
+        self.map_height = map_height
+
         self.planets = planets.copy()
         self.habitability_zone()
 
-        self.game_map = game_map
-        
 
 
     def habitability_zone(self) -> None:
@@ -28,24 +75,29 @@ class StellarSystem:
         self.hab_zone_max = int((1.37 * distance_ZH_star)*120)+ self.star.r*5
 
 
+    def rng(self, stream: int) -> np.random.RandomState:
+        """Return a new random generator for one of the generation steps of this system."""
+        return np.random.RandomState([self.seed, stream])
+
     def generate_planets(self, width: int =None, height: int =None) -> None:
         if width is None:
-            width = self.game_map.width
+            width = self.map_width
         if height is None:
-            height = self.game_map.height
+            height = self.map_height
 
+        rng = self.rng(PLANETS_STREAM)
 
         star_type = self.star.type
 
         if star_type == 'M-type':
-            N = round(np.random.triangular(0, 3, 8))
+            N = round(rng.triangular(0, 3, 8))
             start_x = 10+self.star.r
             if N != 0:
                 dx = (width-start_x-10)/N
             for i in range(N):
-                x = np.random.randint(int(start_x+i*dx)+10, int(start_x+(i+1)*dx)-10)
-                y = np.random.randint(20, height-20)
-                r = np.random.randint(5, 9)
+                x = rng.randint(int(start_x+i*dx)+10, int(start_x+(i+1)*dx)-10)
+                y = rng.randint(20, height-20)
+                r = rng.randint(5, 9)
                 new_planet = Planet(x=x,y=y,r=r)
                 new_planet.parent = self
 
@@ -57,7 +109,7 @@ class StellarSystem:
                     new_planet.tile_dark = tile_types.frozen_planet_dark
                     new_planet.tile_light = tile_types.frozen_planet_light
 
-                    if np.random.random() < 1/40:
+                    if rng.random() < 1/40:
                         new_planet.tile_dark = tile_types.gas_giant_planet_dark
                         new_planet.tile_light = tile_types.gas_giant_planet_light
                         new_planet.r *= 3
@@ -65,7 +117,7 @@ class StellarSystem:
                 else:
                     new_planet.habitable = True
 
-                    if np.random.random() < 0.4: # super-Earth
+                    if rng.random() < 0.4: # super-Earth
                         new_planet.tile_dark_dark = tile_types.super_earth_planet_dark
                         new_planet.tile_dark_light = tile_types.super_earth_planet_light
                         new_planet.r *= 1.6
@@ -74,14 +126,14 @@ class StellarSystem:
 
 
         if star_type in ['K-type','G-type']:
-            N = round(np.random.triangular(0, 4, 8))
+            N = round(rng.triangular(0, 4, 8))
             start_x = 10+self.star.r
             if N != 0:
                 dx = (width-start_x-10)/N
             for i in range(N):
-                x = np.random.randint(int(start_x+i*dx)+10, int(start_x+(i+1)*dx)-10)
-                y = np.random.randint(20, height-20)
-                r = np.random.randint(5, 9)
+                x = rng.randint(int(start_x+i*dx)+10, int(start_x+(i+1)*dx)-10)
+                y = rng.randint(20, height-20)
+                r = rng.randint(5, 9)
                 new_planet = Planet(x=x,y=y,r=r)
                 new_planet.parent = self
 
@@ -93,7 +145,7 @@ class StellarSystem:
                     new_planet.tile_dark = tile_types.frozen_planet_dark
                     new_planet.tile_light = tile_types.frozen_planet_light
 
-                    if np.random.random() < 1/16:
+                    if rng.random() < 1/16:
                         new_planet.tile_dark = tile_types.gas_giant_planet_dark
                         new_planet.tile_light = tile_types.gas_giant_planet_light
                         new_planet.r *= 3
@@ -101,7 +153,7 @@ class StellarSystem:
                 else:
                     new_planet.habitable = True
 
-                    if np.random.random() < 0.4: # super-Earth
+                    if rng.random() < 0.4: # super-Earth
                         new_planet.tile_dark_dark = tile_types.super_earth_planet_dark
                         new_planet.tile_dark_light = tile_types.super_earth_planet_light
                         new_planet.r *= 1.6
@@ -110,14 +162,14 @@ class StellarSystem:
 
 
         if star_type == 'F-type':
-            N = round(np.random.triangular(0, 3, 5))
+            N = round(rng.triangular(0, 3, 5))
             start_x = 10+self.star.r
             if N != 0:
                 dx = (width-start_x-10)/N
             for i in range(N):
-                x = np.random.randint(int(start_x+i*dx)+10, int(start_x+(i+1)*dx)-10)
-                y = np.random.randint(20, height-20)
-                r = np.random.randint(5, 9)
+                x = rng.randint(int(start_x+i*dx)+10, int(start_x+(i+1)*dx)-10)
+                y = rng.randint(20, height-20)
+                r = rng.randint(5, 9)
                 new_planet = Planet(x=x,y=y,r=r)
                 new_planet.parent = self
 
@@ -129,7 +181,7 @@ class StellarSystem:
                     new_planet.tile_dark = tile_types.frozen_planet_dark
                     new_planet.tile_light = tile_types.frozen_planet_light
 
-                    if np.random.random() < 1/6:
+                    if rng.random() < 1/6:
                         new_planet.tile_dark = tile_types.gas_giant_planet_dark
                         new_planet.tile_light = tile_types.gas_giant_planet_light
                         new_planet.r *= 3
@@ -137,7 +189,7 @@ class StellarSystem:
                 else:
                     new_planet.habitable = True
 
-                    if np.random.random() < 0.4: # super-Earth
+                    if rng.random() < 0.4: # super-Earth
                         new_planet.tile_dark_dark = tile_types.super_earth_planet_dark
                         new_planet.tile_dark_light = tile_types.super_earth_planet_light
                         new_planet.r *= 1.6
@@ -146,14 +198,14 @@ class StellarSystem:
 
 
         if star_type == 'A-type':
-            N = round(np.random.triangular(0, 1, 4))
+            N = round(rng.triangular(0, 1, 4))
             start_x = 10+self.star.r
             if N != 0:
                 dx = (width-start_x-10)/N
             for i in range(N):
-                x = np.random.randint(int(start_x+i*dx)+10, int(start_x+(i+1)*dx)-10)
-                y = np.random.randint(20, height-20)
-                r = np.random.randint(5, 9)
+                x = rng.randint(int(start_x+i*dx)+10, int(start_x+(i+1)*dx)-10)
+                y = rng.randint(20, height-20)
+                r = rng.randint(5, 9)
                 new_planet = Planet(x=x,y=y,r=r)
                 new_planet.parent = self
 
@@ -165,7 +217,7 @@ class StellarSystem:
                     new_planet.tile_dark = tile_types.frozen_planet_dark
                     new_planet.tile_light = tile_types.frozen_planet_light
 
-                    if np.random.random() < 1/6:
+                    if rng.random() < 1/6:
                         new_planet.tile_dark = tile_types.gas_giant_planet_dark
                         new_planet.tile_light = tile_types.gas_giant_planet_light
                         new_planet.r *= 3
@@ -173,7 +225,7 @@ class StellarSystem:
                 else:
                     new_planet.habitable = True
 
-                    if np.random.random() < 0.4: # super-Earth
+                    if rng.random() < 0.4: # super-Earth
                         new_planet.tile_dark_dark = tile_types.super_earth_planet_dark
                         new_planet.tile_dark_light = tile_types.super_earth_planet_light
                         new_planet.r *= 1.6
@@ -182,14 +234,14 @@ class StellarSystem:
 
 
         if star_type == 'B-type':
-            N = round(np.random.triangular(0, 0.1, 1))
+            N = round(rng.triangular(0, 0.1, 1))
             start_x = 10+self.star.r
             if N != 0:
                 dx = (width-start_x-10)/N
             for i in range(N):
-                x = np.random.randint(int(start_x+i*dx)+10, int(start_x+(i+1)*dx)-10)
-                y = np.random.randint(20, height-20)
-                r = np.random.randint(5, 9)
+                x = rng.randint(int(start_x+i*dx)+10, int(start_x+(i+1)*dx)-10)
+                y = rng.randint(20, height-20)
+                r = rng.randint(5, 9)
                 new_planet = Planet(x=x,y=y,r=r)
                 new_planet.parent = self
 
@@ -201,7 +253,7 @@ class StellarSystem:
                     new_planet.tile_dark = tile_types.frozen_planet_dark
                     new_planet.tile_light = tile_types.frozen_planet_light
 
-                    if np.random.random() < 0.9:
+                    if rng.random() < 0.9:
                         new_planet.tile_dark = tile_types.gas_giant_planet_dark
                         new_planet.tile_light = tile_types.gas_giant_planet_light
                         new_planet.r *= 3
@@ -209,7 +261,7 @@ class StellarSystem:
                 else:
                     new_planet.habitable = True
 
-                    if np.random.random() < 0.4: # super-Earth
+                    if rng.random() < 0.4: # super-Earth
                         new_planet.tile_dark_dark = tile_types.super_earth_planet_dark
                         new_planet.tile_dark_light = tile_types.super_earth_planet_light
                         new_planet.r *= 1.6
@@ -235,36 +287,24 @@ class Planet:
     def center(self) -> Tuple[int, int]:
         return self.x, self.y
 
-    def inner(self, map_width, map_height) -> Tuple[slice, slice]:
-        """Return the inner area of this room as a 2D array index."""
-        area = np.full((map_width, map_height), False, order='F')
-        x = np.arange(map_width)
-        y = np.arange(map_height)
-
-        for i in x:
-            for j in y:
-                if (i-self.x)**2 + (j-self.y)**2 < self.r**2:
-                    area[i,j] = True 
-        
-        return area
+    def inner(self, map_width, map_height) -> np.ndarray:
+        """Return the inner area of this planet as a 2D boolean mask."""
+        return ring_mask(map_width, map_height, self.x, self.y, self.r)
 
 
-    def facing_star(self, map_width, map_height) -> Tuple[slice, slice]:
-        """Return the inner area of this room as a 2D array index."""
+    def facing_star(self, map_width, map_height) -> np.ndarray:
+        """Return the half of this planet lit by its star as a 2D boolean mask."""
         star = self.parent.star
         dist2 = (star.x - self.x)**2 + (star.y - self.y)**2
 
+        area = self.inner(map_width, map_height)
+        x_low, x_high = max(int(self.x - self.r), 0), min(int(self.x + self.r) + 2, map_width)
+        y_low, y_high = max(int(self.y - self.r), 0), min(int(self.y + self.r) + 2, map_height)
 
-        area = np.full((map_width, map_height), False, order='F')
-        x = np.arange(map_width)
-        y = np.arange(map_height)
+        dx = np.arange(x_low, x_high)[:, np.newaxis] - star.x
+        dy = np.arange(y_low, y_high)[np.newaxis, :] - star.y
+        area[x_low:x_high, y_low:y_high] &= dx**2 + dy**2 < dist2
 
-        for i in x:
-            for j in y:
-                if (i-star.x)**2 + (j-star.y)**2 < dist2 \
-                   and (i-self.x)**2 + (j-self.y)**2 < self.r**2:
-                    area[i,j] = True 
-        
         return area
 
 
@@ -350,36 +390,18 @@ class Star:
         return Masses
 
 
-    def inner(self, map_width, map_height, rad=None) -> Tuple[slice, slice]:
-        """Return the inner area of this room as a 2D array index."""
+    def inner(self, map_width, map_height, rad=None) -> np.ndarray:
+        """Return the inner area of this star as a 2D boolean mask."""
         if rad is None: rad = self.r
 
-        area = np.full((map_width, map_height), False, order='F')
-        x = np.arange(map_width)
-        y = np.arange(map_height)
-
-        for i in x:
-            for j in y:
-                if (i-self.x)**2 + (j-self.y)**2 < rad**2:
-                    area[i,j] = True 
-        
-        return area
+        return ring_mask(map_width, map_height, self.x, self.y, rad)
 
 
-    def outter(self, map_width, map_height, rad=None) -> Tuple[slice, slice]:
-        """Return the inner area of this room as a 2D array index."""
+    def outter(self, map_width, map_height, rad=None) -> np.ndarray:
+        """Return the ring just outside of this star as a 2D boolean mask."""
         if rad is None: rad = self.r+2
 
-        area = np.full((map_width, map_height), False, order='F')
-        x = np.arange(map_width)
-        y = np.arange(map_height)
-
-        for i in x:
-            for j in y:
-                if (self.r-1)**2 < (i-self.x)**2 + (j-self.y)**2 < rad**2:
-                    area[i,j] = True 
-        
-        return area
+        return ring_mask(map_width, map_height, self.x, self.y, rad, r_inner=self.r-1)
 
 
     def check_proximity(self, other_star):
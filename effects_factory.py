@@ -1,5 +1,13 @@
+from __future__ import annotations
+
+from typing import Dict, List, TYPE_CHECKING
+
 from entity import Effect
 
+if TYPE_CHECKING:
+    from game_map import GameMap
+
+
 laser_beam = Effect(
     char="|",
     color=(255, 0, 0),
@@ -14,4 +22,75 @@ explosion = Effect(
     name="explosion",
     lifetime_in_turns=1,
     speed = 100,
-)
\ No newline at end of file
+)
+
+
+# Every prototype by name.
+prototypes: Dict[str, Effect] = {
+    "laser_beam": laser_beam,
+    "explosion": explosion,
+}
+
+
+class EffectPool:
+    """
+    Recycles the effects spawned from the prototypes above.
+
+    Effects are short lived, so instead of cloning a prototype for every explosion
+    `spawn` hands out an effect of the same prototype that despawned earlier, reset
+    to the prototype's state.  Despawned effects come back through `release` (see
+    Effect.despawn); at most `max_free` of them are kept per prototype.
+    """
+
+    def __init__(self, max_free: int = 1000):
+        self.max_free = max_free
+        self.free: Dict[str, List[Effect]] = {name: [] for name in prototypes}
+
+        # Statistics: in steady state `created` stops growing.
+        self.created = 0
+        self.reused = 0
+        self.released = 0
+
+    def spawn(self, name: str, gamemap: GameMap, x: int, y: int) -> Effect:
+        prototype = prototypes[name]
+        free = self.free[name]
+        if free:
+            effect = free.pop()
+            effect.reset(prototype)
+            self.reused += 1
+        else:
+            effect = prototype.clone()
+            effect.pool_key = name
+            self.created += 1
+
+        effect.x = x
+        effect.y = y
+        effect.parent = gamemap
+        gamemap.add_entity(effect)
+        return effect
+
+    def release(self, effect: Effect) -> None:
+        """Take back an effect that despawned."""
+        free = self.free[effect.pool_key]
+        if len(free) < self.max_free:
+            # Do not keep the shooter alive through a pooled laser.
+            effect.origin = None
+            effect.stored_action = None
+            free.append(effect)
+            self.released += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "created": self.created,
+            "reused": self.reused,
+            "released": self.released,
+            "free": sum(len(free) for free in self.free.values()),
+        }
+
+
+pool = EffectPool()
+
+
+def spawn(name: str, gamemap: GameMap, x: int, y: int) -> Effect:
+    """Spawn an effect from the prototype called `name`, recycled from the pool if possible."""
+    return pool.spawn(name, gamemap, x, y)
@@ -1,21 +1,35 @@
 from __future__ import annotations
 
-import lzma
-import pickle
-import numpy as np
-from typing import TYPE_CHECKING
+import time
+from typing import Optional, TYPE_CHECKING
 
+import numpy as np
 from tcod.console import Console
 from tcod.map import compute_fov
+import tcod.path
 
 import exceptions
 from message_log import MessageLog
 import render_functions
 import color
+from timers import timers
+from tracing import record, span, tracer
 
 if TYPE_CHECKING:
+    from autosave import Autosaver
     from entity import Actor
     from game_map import GameMap, GameWorld
+    from savefile import SaveReport
+
+
+FOV_RADIUS = 50
+# Dormant actors within this many tiles of the player wake up, a few turns before
+# they could come into view.
+WAKE_RADIUS = FOV_RADIUS + 5
+# Hostiles within this many tiles of the player chase them down the shared distance
+# field, farther ones find their own path, see `Engine.get_player_distance_field`.  On the 237x129 main map the field takes
+# about 3.6 ms, as much as 4 to 8 paths of their own, against 9 ms for the whole map.
+PLAYER_FIELD_RADIUS = WAKE_RADIUS
 
 
 class Engine(object):
@@ -26,54 +40,172 @@ class Engine(object):
         self.message_log = MessageLog()
         self.mouse_location = (0, 0)
         self.player = player
-        self.index = 0
+        self.index = 0  # Turns played so far, used as the turn scheduler clock.
 
+        self._player_distance = None
+        self._player_distance_key = None
+
+        self._fov_key = None
+
+        self.autosaver: Optional[Autosaver] = None
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        # The distance field cache is rebuilt on demand, keep it out of saves.
+        state["_player_distance"] = None
+        state["_player_distance_key"] = None
+        state["_fov_key"] = None
+        state["autosaver"] = None
+        return state
 
     def main_turns_cycle(self) -> None:
-        actors = set(self.game_map.actors)-{self.player}
-        actors = np.array(list(actors)+list(self.game_map.effects))
+        """
+        Let every scheduled entity of the current map gain energy and act for one turn,
+        then move the projectiles in flight.
 
-        if self.index > len(actors):
-            self.index -= len(actors)
+        `self.index` counts the turns; entities left over from an interrupted turn
+        are due first, so the next cycle continues where we broke off.
 
-        # continue where we broke off
-        actors = np.concatenate((actors[self.index:], actors[:self.index]))
-        
+        Idle actors out of WAKE_RADIUS of the player are left dormant after their
+        turn (see `GameMap.sleep`), and the dormant actors within it are woken up
+        before anyone acts, so the cost of a turn grows with the actors around the
+        player rather than with all those on the map.
 
-        for i, entity in enumerate(actors):
-            entity.action_points += entity.speed
-            entity.decide_what_to_do()
-            action = entity.stored_action
+        With `timers` enabled, the turn is timed as a whole, per AI class ("ai.*",
+        effects under "ai.Effect") and per action type ("action.*").  With `tracer`
+        enabled, every entity's turn, `decide_what_to_do` call and action is traced.
+        """
+        profiled = timers.enabled or tracer.enabled
+        if profiled:
+            turn_start = time.perf_counter()
+        game_map = self.game_map
+        scheduler = game_map.scheduler
+        game_map.wake_area(self.player.x, self.player.y, WAKE_RADIUS)
+        self.index += 1
 
-            while action is not None:
+        while True:
+            due = scheduler.pop_due(self.index)
+            if due is None:
+                break
+            entity, key = due
 
-                # if entity ceased to exist before its turn -> skip its turn
-                if entity not in list(self.game_map.actors)+list(self.game_map.effects):
-                    break
+            # entities that died or despawned since being scheduled are dropped here
+            if entity not in game_map.actors and entity not in game_map.effects:
+                continue
 
+            if profiled:
+                entity_start = time.perf_counter()
+                entity_args = {"entity": entity.name, "id": id(entity)}
+            try:
+                entity.action_points += entity.speed
+                if profiled:
+                    decide_start = time.perf_counter()
                 entity.decide_what_to_do()
-                action = entity.get_action()
+                if profiled:
+                    record("decide_what_to_do", "ai", decide_start, args=entity_args)
+                action = entity.stored_action
 
-                if action is None:
-                    break
+                while action is not None:
 
-                try:
-                    spawned_actor = action.perform()
-                    entity.action_points -= action.cost
+                    # if entity ceased to exist before its turn -> skip its turn
+                    if entity not in game_map.actors and entity not in game_map.effects:
+                        break
+
+                    if profiled:
+                        decide_start = time.perf_counter()
+                    entity.decide_what_to_do()
+                    if profiled:
+                        record("decide_what_to_do", "ai", decide_start, args=entity_args)
+                    action = entity.get_action()
+
+                    if action is None:
+                        break
+
+                    if profiled:
+                        action_start = time.perf_counter()
+                    try:
+                        spawned_actor = action.perform()
+                        entity.action_points -= action.cost
 
-                    if spawned_actor:
-                        actors = np.insert(actors, i+1, spawned_actor)
+                        if spawned_actor in scheduler:
+                            # spawned entities act right after their spawner
+                            scheduler.schedule_after(spawned_actor, key)
 
-                except exceptions.Impossible as exc:
-                    if entity in set(self.game_map.effects):
-                        entity.despawn()
+                    except exceptions.Impossible as exc:
+                        if entity in game_map.effects:
+                            entity.despawn()
 
-                    entity.stored_action = None
-                    break
+                        entity.stored_action = None
+                        break
+                    finally:
+                        if profiled:
+                            name = type(action).__name__
+                            record(name, "action", action_start, "action." + name, entity_args, accumulate=True)
+            finally:
+                if entity in game_map.actors:
+                    if self.can_sleep(entity):
+                        game_map.sleep(entity)
+                    else:
+                        scheduler.schedule(entity, self.index + 1)
+                elif entity in game_map.effects:
+                    scheduler.schedule(entity, self.index + 1)
+                if profiled:
+                    ai = getattr(entity, "ai", None)
+                    timer = "ai." + type(ai if ai is not None else entity).__name__
+                    record(entity.name, "entity", entity_start, timer, entity_args, accumulate=True)
 
-           
-            self.index += 1
+        # Projectiles fired during the turn move after everyone has acted.
+        with span("projectiles", "turn", "projectiles", {"live": len(game_map.projectiles)}):
+            game_map.projectiles.step()
+        if profiled:
+            record("main_turns_cycle", "turn", turn_start, "turn", {"turn": self.index})
+            timers.flush()
     
+    def can_sleep(self, actor: Actor) -> bool:
+        """Return True if `actor` can be left dormant: idle, and out of WAKE_RADIUS of the player."""
+        player = self.player
+        return (
+            (abs(actor.x - player.x) > WAKE_RADIUS or abs(actor.y - player.y) > WAKE_RADIUS)
+            and actor.ai.is_idle()
+        )
+
+    def get_player_distance_field(self) -> np.ndarray:
+        """
+        Return the Dijkstra distance to the player from every tile within
+        PLAYER_FIELD_RADIUS of them on the current map, the maximum elsewhere.
+
+        Hostile AI within the window descends this field to chase the player.
+        Unlike a field over the whole map, it leaves hostiles farther away to find
+        their own path: no hostile in sight is ever out of the window, and building
+        it for the whole map would take about 2.5 times as long on every move of
+        the player.
+
+        Only the terrain is taken into account, so that ships moving around do not
+        invalidate it: it is computed again only if the player moved or the terrain
+        changed.  Getting around other ships is left to `BaseAI.descend`.
+        """
+        game_map = self.game_map
+        player = self.player
+        key = (game_map, player.x, player.y, game_map.terrain_version)
+
+        if self._player_distance is not None and self._player_distance_key == key:
+            return self._player_distance
+
+        x1 = max(player.x - PLAYER_FIELD_RADIUS, 0)
+        x2 = min(player.x + PLAYER_FIELD_RADIUS + 1, game_map.width)
+        y1 = max(player.y - PLAYER_FIELD_RADIUS, 0)
+        y2 = min(player.y + PLAYER_FIELD_RADIUS + 1, game_map.height)
+
+        distance = tcod.path.maxarray((game_map.width, game_map.height), dtype=np.int32, order="F")
+        distance[player.x, player.y] = 0
+        window = distance[x1:x2, y1:y2]
+        cost = game_map.tiles["walkable"][x1:x2, y1:y2].astype(np.int8)
+        tcod.path.dijkstra2d(window, cost, cardinal=2, diagonal=3, out=window)
+
+        self._player_distance = distance
+        self._player_distance_key = key
+        return distance
+
     def handle_enemy_turns(self) -> None:
         for entity in set(self.game_map.actors) - {self.player}:
             if entity.ai:
@@ -92,39 +224,81 @@ class Engine(object):
                 entity.despawn()
 
     def update_fov(self) -> None:
-        """Recompute the visible area based on the players point of view."""
-        self.game_map.visible[:] = compute_fov(
-            self.game_map.tiles["transparent"],
-            (self.player.x, self.player.y),
-            radius=50,
-        )
+        """
+        Recompute the visible area based on the players point of view.
+
+        Only the box of tiles within FOV_RADIUS of the player is computed and written,
+        nothing outside of it can be visible.  Nothing is done at all if neither the
+        player nor the map's terrain changed since the last call.
+        """
+        game_map = self.game_map
+        player = self.player
+
+        key = (game_map, player.x, player.y, game_map.terrain_version)
+        if key == self._fov_key:
+            return
+        with span("update_fov", "fov", "fov"):
+            x1 = max(player.x - FOV_RADIUS, 0)
+            x2 = min(player.x + FOV_RADIUS + 1, game_map.width)
+            y1 = max(player.y - FOV_RADIUS, 0)
+            y2 = min(player.y + FOV_RADIUS + 1, game_map.height)
+            region = (slice(x1, x2), slice(y1, y2))
+
+            if game_map.fov_region is None:
+                game_map.visible[:] = False
+            else:
+                game_map.visible[game_map.fov_region] = False
+
+            game_map.visible[region] = compute_fov(
+                game_map.tiles["transparent"][region],
+                (player.x - x1, player.y - y1),
+                radius=FOV_RADIUS,
+            )
+            game_map.fov_region = region
+            self._fov_key = key
         # If a tile is "visible" it should be added to "explored".
         #self.game_map.explored |= self.game_map.visible
 
 
     def render(self, console: Console) -> None:
-        self.game_map.render(console)
+        """
+        Draw the map, the message log and the HUD.
 
-        self.message_log.render(console=console, x=21, y=45, width=40, height=5)
+        With `timers` enabled, each of them is timed ("render.map", "render.log",
+        "render.hud", and "render" for all of them) and the performance overlay is
+        drawn on top.  With `tracer` enabled, the same passes are traced.
+        """
+        with span("render", "render", "render"):
+            with span("render.map", "render", "render.map"):
+                self.game_map.render(console)
 
-        render_functions.render_bar(
-            console=console,
-            current_value=self.player.fighter.hp,
-            maximum_value=self.player.fighter.max_hp,
-            total_width=20,
-        )
+            with span("render.log", "render", "render.log"):
+                self.message_log.render(console=console, x=21, y=45, width=40, height=5)
 
-        render_functions.render_space_level(
-            console=console,
-            gameworld=self.game_world,
-            location=(0, 47),
-        )
+            with span("render.hud", "render", "render.hud"):
+                render_functions.render_bar(
+                    console=console,
+                    current_value=self.player.fighter.hp,
+                    maximum_value=self.player.fighter.max_hp,
+                    total_width=20,
+                )
+
+                render_functions.render_space_level(
+                    console=console,
+                    gameworld=self.game_world,
+                    location=(0, 47),
+                )
+
+                render_functions.render_names_at_mouse_location(console=console, x=21, y=44, engine=self)
+
+        if timers.enabled:
+            render_functions.render_perf_overlay(console=console, engine=self)
 
-        render_functions.render_names_at_mouse_location(console=console, x=21, y=44, engine=self)
+    def save_as(self, filename: str) -> SaveReport:
+        """Save this Engine instance and its galaxy, see `savefile`."""
+        import savefile
 
-    def save_as(self, filename: str) -> None:
-        """Save this Engine instance as a compressed file."""
-        save_data = lzma.compress(pickle.dumps(self))
-        with open(filename, "wb") as f:
-            f.write(save_data)
+        if self.autosaver is not None:
+            self.autosaver.wait()
+        return savefile.save(self, filename)
         
\ No newline at end of file
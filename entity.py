@@ -1,12 +1,12 @@
 from __future__ import annotations
 
-import copy
 import math
 from typing import Optional, Tuple, Type, TypeVar, TYPE_CHECKING, Union
 from actions import ProjectileFlyAction,WaitAction
 import actions
 
 from render_order import RenderOrder
+from slotted import Slotted
 
 if TYPE_CHECKING:
     from components.ai import BaseAI
@@ -20,11 +20,19 @@ if TYPE_CHECKING:
 T = TypeVar("T", bound="Entity")
 
 
-class Entity(object):
+class Entity(Slotted):
     """
     A generic object to represent players, enemies, items, etc.
+
+    Entities and their subclasses use __slots__ to stay small, new attributes have
+    to be declared there.
     """
 
+    __slots__ = (
+        "parent", "x", "y", "global_map_x", "global_map_y",
+        "char", "color", "name", "blocks_movement", "render_order",
+    )
+
     parent: Union[GameMap, Inventory]
 
     def __init__(
@@ -52,24 +60,43 @@ class Entity(object):
         if parent:
             # If parent isn't provided now then it will be set later.
             self.parent = parent
-            parent.entities.add(self)
+            parent.add_entity(self)
 
     @property
     def gamemap(self) -> GameMap:
         return self.parent.gamemap
 
+    def clone(self: T) -> T:
+        """
+        Return a new entity built like this one, on no map.
+
+        Plain values (name, char, color...) are shared, they are never modified in
+        place.  Components are copied so that every clone owns its own.
+        """
+        return Entity(
+            x=self.x,
+            y=self.y,
+            global_map_x=self.global_map_x,
+            global_map_y=self.global_map_y,
+            char=self.char,
+            color=self.color,
+            name=self.name,
+            blocks_movement=self.blocks_movement,
+            render_order=self.render_order,
+        )
+
     def spawn(self: T, gamemap: GameMap, x: int, y: int) -> T:
         """Spawn a copy of this instance at the given location."""
-        clone = copy.deepcopy(self)
+        clone = self.clone()
         clone.x = x
         clone.y = y
         clone.parent = gamemap
-        gamemap.entities.add(clone)
+        gamemap.add_entity(clone)
         return clone
 
     def despawn(self: T) -> None:
         """despawn this instance"""
-        self.gamemap.entities.remove(self)
+        self.gamemap.remove_entity(self)
 
     def place(self, x: int, y: int, gamemap: Optional[GameMap] = None) -> None:
         """Place this entity at a new location.  Handles moving across GameMaps."""
@@ -78,9 +105,11 @@ class Entity(object):
         if gamemap:
             if hasattr(self, "parent"):  # Possibly uninitialized.
                 if self.parent is self.gamemap:
-                    self.gamemap.entities.remove(self)
+                    self.gamemap.remove_entity(self)
             self.parent = gamemap
-            gamemap.entities.add(self)
+            gamemap.add_entity(self)
+        elif hasattr(self, "parent") and self.parent is self.gamemap:
+            self.gamemap.relocate_entity(self)
 
     def distance(self, x: int, y: int) -> float:
         """
@@ -92,6 +121,7 @@ class Entity(object):
         # Move the entity by a given amount
         self.x += dx
         self.y += dy
+        self.parent.relocate_entity(self)
 
         engine = self.parent.engine
         if engine.game_map is engine.game_world.main_map:
@@ -100,6 +130,10 @@ class Entity(object):
 
 
 class Effect(Entity):
+    __slots__ = (
+        "vx", "vy", "lifetime_in_turns", "origin",
+        "speed", "action_points", "stored_action", "pool_key",
+    )
 
     def __init__(
         self,
@@ -136,11 +170,43 @@ class Effect(Entity):
         self.action_points = action_points
         self.stored_action = stored_action
 
+        # Name of the effects_factory prototype this effect was taken from, if it came
+        # from the effect pool.  It goes back there when it despawns.
+        self.pool_key: Optional[str] = None
+
+    def clone(self) -> Effect:
+        clone = Effect(speed=self.speed)
+        clone.reset(self)
+        return clone
+
+    def reset(self, prototype: Effect) -> None:
+        """Put this effect in the state of a fresh clone of `prototype`, see `clone`."""
+        self.x = prototype.x
+        self.y = prototype.y
+        self.global_map_x = prototype.global_map_x
+        self.global_map_y = prototype.global_map_y
+        self.char = prototype.char
+        self.color = prototype.color
+        self.name = prototype.name
+        self.vx = prototype.vx
+        self.vy = prototype.vy
+        self.lifetime_in_turns = prototype.lifetime_in_turns
+        self.origin = prototype.origin
+        self.speed = prototype.speed
+        self.action_points = prototype.action_points
+        self.stored_action = None
+
+    def despawn(self) -> None:
+        super().despawn()
+        if self.pool_key is not None:
+            import effects_factory
+
+            effects_factory.pool.release(self)
 
     def decide_what_to_do(self) -> None:
 
         if self.vx != 0 or self.vy != 0:
-            self.stored_action = ProjectileFlyAction(self, self.vx[0], self.vy[0])
+            self.stored_action = ProjectileFlyAction(self, self.vx, self.vy)
         else:
             self.stored_action = WaitAction(self)
 
@@ -161,6 +227,8 @@ class Effect(Entity):
 
 
 class Actor(Entity):
+    __slots__ = ("ai", "equipment", "fighter", "inventory", "speed", "action_points", "stored_action")
+
     def __init__(
         self,
         *,
@@ -205,6 +273,25 @@ class Actor(Entity):
         self.action_points = action_points
         self.stored_action = stored_action
 
+    def clone(self) -> Actor:
+        inventory = self.inventory.clone()
+        clone = Actor(
+            x=self.x,
+            y=self.y,
+            char=self.char,
+            color=self.color,
+            name=self.name,
+            ai_cls=None,
+            equipment=self.equipment.clone(dict(zip(self.inventory.items, inventory.items))),
+            fighter=self.fighter.clone(),
+            inventory=inventory,
+            action_points=self.action_points,
+            speed=self.speed,
+        )
+        if self.ai is not None:
+            clone.ai = self.ai.clone(clone)
+        return clone
+
     @property
     def is_alive(self) -> bool:
         """Returns True as long as this actor can perform actions."""
@@ -222,11 +309,25 @@ class Actor(Entity):
             if action.cost < self.action_points:
                 self.stored_action = None
                 return action
+
+    def fast_forward(self, turns: int) -> None:
+        """
+        Catch up on `turns` turns spent waiting, see `GameMap.sleep`.
+
+        Every turn an actor gains `speed` action points and spends them on WaitActions,
+        which cost `speed`, for as long as it has more than that left.
+        """
+        points = self.action_points + turns * self.speed
+        if turns > 0 and self.speed > 0 and points > self.speed:
+            points -= -(-(points - self.speed) // self.speed) * self.speed
+        self.action_points = points
                 
 
 
 
 class Item(Entity):
+    __slots__ = ("consumable", "equippable")
+
     def __init__(
         self,
         *,
@@ -258,4 +359,15 @@ class Item(Entity):
         if self.equippable:
             self.equippable.parent = self
 
+    def clone(self) -> Item:
+        return Item(
+            x=self.x,
+            y=self.y,
+            char=self.char,
+            color=self.color,
+            name=self.name,
+            consumable=self.consumable.clone() if self.consumable else None,
+            equippable=self.equippable.clone() if self.equippable else None,
+        )
+
 
@@ -1,3 +1,7 @@
+from __future__ import annotations
+
+from typing import Dict, TYPE_CHECKING
+
 from components.ai import HostileEnemy
 from components import consumable, equippable
 from components.equipment import Equipment
@@ -5,6 +9,10 @@ from components.fighter import Fighter
 from entity import Actor, Item, Effect
 from components.inventory import Inventory
 
+if TYPE_CHECKING:
+    from entity import Entity
+    from game_map import GameMap
+
 # player
 player = Actor(
     char="@",
@@ -91,3 +99,22 @@ Deflector_Shields_Armor = Item(
 )
 
 
+# Every prototype by name.
+prototypes: Dict[str, Entity] = {
+    "player": player,
+    "skirmisher": skirmisher,
+    "fighter": fighter,
+    "repair_kit": repair_kit,
+    "lightning_scroll": lightning_scroll,
+    "targeted_EMP": targeted_EMP,
+    "missile": missile,
+    "dagger_laser": dagger_laser,
+    "sword_laser": sword_laser,
+    "basic_armor": basic_armor,
+    "Deflector_Shields_Armor": Deflector_Shields_Armor,
+}
+
+
+def spawn(name: str, gamemap: GameMap, x: int, y: int) -> Entity:
+    """Spawn a new entity from the prototype called `name`."""
+    return prototypes[name].spawn(gamemap, x, y)
@@ -4,5 +4,8 @@ class Impossible(Exception):
     The reason is given as the exception message.
     """
 
+class SaveFormatError(Exception):
+    """Exception raised when a save file can not be read."""
+
 class QuitWithoutSaving(SystemExit):
     """Can be raised to exit the game without automatically saving."""
\ No newline at end of file
@@ -1,83 +1,354 @@
 from __future__ import annotations
 
-from typing import Iterable, Iterator, Optional, TYPE_CHECKING
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, KeysView, List, Optional, Tuple, TYPE_CHECKING
 
 import numpy as np  
 from tcod.console import Console
 
 from entity import Actor, Item, Effect
+from projectiles import LASER_COLOR, ProjectileTable
+from render_order import RenderOrder
+from spatial_index import SpatialIndex
+from turn_scheduler import TurnScheduler
 import tile_types
 
 if TYPE_CHECKING:
+    from components.stellar_system import StellarSystem
     from engine import Engine
     from entity import Entity
+    from savefile import SaveReader
+
+# Size in tiles of the cells dormant actors are grouped by, for `GameMap.wake_area`.
+DORMANT_CELL_SIZE = 16
+
 
 class GameMap:
     def __init__(
         self, engine: Engine, width: int, height: int, 
-        window_width: int, window_height: int, entities: Iterable[Entity] = ()
+        window_width: int, window_height: int, entities: Iterable[Entity] = (),
+        rng: Optional[np.random.RandomState] = None, tiles: Optional[np.ndarray] = None,
     ):
         self.engine = engine
         self.width, self.height = width, height
         self.window_width, self.window_height = window_width, window_height
-        self.entities = set(entities)
-
-        self.tiles = np.full((width, height), fill_value=tile_types.floor, order="F")
-        sel = np.random.random(size=self.tiles.shape)
-        sel = (sel >= 0.95)
-        self.tiles[sel] = np.full(len(self.tiles[sel]), fill_value=tile_types.floor_star)
+        self.entities = set()
+        self.entity_index = SpatialIndex()
+
+        # Per-kind buckets, kept in sync by add_entity, remove_entity and refresh_entity.
+        # Dicts are used as insertion ordered sets.
+        self._actors: Dict[Actor, None] = {}
+        self._corpses: Dict[Actor, None] = {}
+        self._effects: Dict[Effect, None] = {}
+        self._items: Dict[Item, None] = {}
+        self._buckets: Dict[Entity, Dict] = {}
+
+        # Living actors and effects that take turns, except for the player and dormant actors.
+        self.scheduler = TurnScheduler()
+
+        # Actors left out of the scheduler until something wakes them up, see `sleep`:
+        # the turn each fell asleep on and its cell, and the dormant actors by cell.
+        self._dormant: Dict[Actor, Tuple[int, Tuple[int, int]]] = {}
+        self._dormant_cells: Dict[Tuple[int, int], Dict[Actor, None]] = {}
+
+        # Entities by render order, drawn bottom to top.  The arrays `render` draws
+        # each layer from are cached until an entity of the layer changes.
+        self._render_layers: Dict[RenderOrder, Dict[Entity, None]] = {order: {} for order in RenderOrder}
+        self._render_layer_of: Dict[Entity, RenderOrder] = {}
+        self._render_arrays: Dict[RenderOrder, Tuple[np.ndarray, ...]] = {}
+
+        # Lasers in flight, moved together by the engine at the end of every turn.
+        self.projectiles = ProjectileTable(self)
+
+        if tiles is not None:
+            # Prebuilt terrain.
+            self.tiles = np.asfortranarray(tiles)
+        else:
+            self.tiles = np.full((width, height), fill_value=tile_types.floor, order="F")
+            if rng is None:
+                rng = np.random
+            sel = rng.random(size=self.tiles.shape)
+            sel = (sel >= 0.95)
+            self.tiles[sel] = np.full(len(self.tiles[sel]), fill_value=tile_types.floor_star)
 
         self.visible = np.full((width, height), fill_value=False, order="F")  # Tiles the player can currently see
         self.explored = np.full((width, height), fill_value=True, order="F")  # Tiles the player can currently see
 
         self.system_exit_location = np.full((width, height), fill_value=False, order="F") 
 
+        # What `tiles` and `system_exit_location` were generated from, if they can be
+        # generated again (see procgen.SpaceTerrain).  Saves then only keep the changes.
+        self.terrain_recipe = None
+
+        # Area of `visible` written by the last field of view update, None means all of it.
+        self.fov_region: Optional[Tuple[slice, slice]] = None
+        self.terrain_version = 0  # Bumped by update_terrain.
+
+        # Number of movement blocking entities on each tile, and the pathfinding cost
+        # derived from it and the terrain: 0 for walls, 1 for free tiles and +10 for
+        # every blocking entity on the tile.
+        # Both are updated in place whenever a blocking entity appears, moves or goes away.
+        self.occupancy = np.zeros((width, height), dtype=np.int16, order="F")
+        self.path_cost = np.zeros((width, height), dtype=np.int16, order="F")
+        self._blocker_positions: Dict[Entity, Tuple[int, int]] = {}
+        self.path_cost_version = 0  # Bumped whenever path_cost changes.
+        self.update_terrain()
+
+        for entity in entities:
+            self.add_entity(entity)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["_render_arrays"] = {}
+        # Derived from the terrain and the entities, rebuilt by __setstate__.
+        del state["occupancy"]
+        del state["path_cost"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        if "entity_index" not in state:
+            return  # Saved as a single pickle, `savefile.load` calls `rebuild` once it is all loaded.
+        if "projectiles" not in state:  # Saved before projectiles had their own table.
+            self.projectiles = ProjectileTable(self)
+        if "_dormant" not in state:  # Saved before actors could be dormant.
+            self._dormant = {}
+            self._dormant_cells = {}
+        self.occupancy = np.zeros((self.width, self.height), dtype=np.int16, order="F")
+        self.path_cost = np.zeros((self.width, self.height), dtype=np.int16, order="F")
+        for x, y in self._blocker_positions.values():
+            self.occupancy[x, y] += 1
+        self.update_terrain()
+
+    def rebuild(self) -> None:
+        """
+        Rebuild what the map derives from its terrain and `entities`: the indexes,
+        buckets, scheduler, render layers and occupancy grids.
+
+        For maps saved before the map kept any of them, see `savefile.load`.
+        """
+        kept = {name: getattr(self, name) for name in ("visible", "explored", "system_exit_location")}
+        GameMap.__init__(
+            self, self.engine, self.width, self.height, self.window_width, self.window_height,
+            entities=list(self.entities), tiles=self.tiles,
+        )
+        self.__dict__.update(kept)
+
     @property
     def gamemap(self) -> GameMap:
         return self
 
     @property
-    def actors(self) -> Iterator[Actor]:
-        """Iterate over this maps living actors."""
-        yield from (
-            entity
-            for entity in self.entities
-            if isinstance(entity, Actor) and entity.is_alive
-        )
+    def actors(self) -> KeysView[Actor]:
+        """This maps living actors."""
+        return self._actors.keys()
 
     @property
-    def corpses(self) -> Iterator[Actor]:
-        """Iterate over this maps living actors."""
-        yield from (
-            entity
-            for entity in self.entities
-            if isinstance(entity, Actor) and not entity.is_alive
-        )
+    def corpses(self) -> KeysView[Actor]:
+        """The remains of this maps dead actors."""
+        return self._corpses.keys()
 
     @property
-    def effects(self) -> Iterator[Effect]:
-        """Iterate over this maps living actors."""
-        yield from (
-            entity
-            for entity in self.entities
-            if isinstance(entity, Effect) and entity.lifetime_in_turns != 0
-        )
+    def effects(self) -> KeysView[Effect]:
+        """This maps active effects."""
+        return self._effects.keys()
 
     @property
-    def items(self) -> Iterator[Item]:
-        yield from (entity for entity in self.entities if isinstance(entity, Item))
+    def items(self) -> KeysView[Item]:
+        return self._items.keys()
+
+    @property
+    def dormant(self) -> KeysView[Actor]:
+        """This maps living actors that are left out of the scheduler, see `sleep`."""
+        return self._dormant.keys()
+
+    def _bucket_for(self, entity: Entity) -> Optional[Dict]:
+        if isinstance(entity, Actor):
+            return self._actors if entity.is_alive else self._corpses
+        if isinstance(entity, Effect):
+            return self._effects if entity.lifetime_in_turns != 0 else None
+        if isinstance(entity, Item):
+            return self._items
+        return None
+
+    def refresh_entity(self, entity: Entity) -> None:
+        """
+        Move an entity into the bucket matching its current state, e.g. after it died.
+
+        Must also be called after the char, color or render_order of an entity on this
+        map changed.
+        """
+        self._update_occupancy(entity)
+        self._set_render_layer(entity, entity.render_order)
+
+        old_bucket = self._buckets.pop(entity, None)
+        if old_bucket is not None:
+            del old_bucket[entity]
+
+        bucket = self._bucket_for(entity)
+        if bucket is not None:
+            bucket[entity] = None
+            self._buckets[entity] = bucket
+
+        if bucket is self._actors or bucket is self._effects:
+            if entity is not self.engine.player and entity not in self.scheduler and entity not in self._dormant:
+                self.scheduler.schedule(entity, self.engine.index + 1)
+        else:
+            self.scheduler.discard(entity)
+            self._forget_dormant(entity)
+
+    def add_entity(self, entity: Entity) -> None:
+        """Add an entity to this map, or re-index it if it is already here."""
+        self.entities.add(entity)
+        self.entity_index.add(entity)
+        self.refresh_entity(entity)
+
+    def remove_entity(self, entity: Entity) -> None:
+        self.entities.remove(entity)
+        self.entity_index.remove(entity)
+        self._update_occupancy(entity)
+        self._set_render_layer(entity, None)
+
+        bucket = self._buckets.pop(entity, None)
+        if bucket is not None:
+            del bucket[entity]
+        self.scheduler.discard(entity)
+        self._forget_dormant(entity)
+
+    def relocate_entity(self, entity: Entity) -> None:
+        """Must be called after an entity on this map changed its x or y."""
+        if entity in self._dormant:
+            self.wake(entity)  # Something moved it, it is not left alone anymore.
+        self.entity_index.update(entity)
+        if entity.blocks_movement:
+            self._update_occupancy(entity)
+        self._render_arrays.pop(self._render_layer_of[entity], None)
+
+    def sleep(self, actor: Actor) -> None:
+        """
+        Take a living actor out of the scheduler until `wake` puts it back.
+
+        Only meant for actors that would spend every turn waiting until something
+        happens to them (see `Engine.main_turns_cycle`): `wake` fast-forwards them
+        through the turns they slept as if they had waited.
+        """
+        self.scheduler.discard(actor)
+        cell = (actor.x // DORMANT_CELL_SIZE, actor.y // DORMANT_CELL_SIZE)
+        self._dormant[actor] = (self.engine.index, cell)
+        self._dormant_cells.setdefault(cell, {})[actor] = None
+
+    def wake(self, actor: Actor) -> None:
+        """Schedule a dormant actor for the next turn, caught up on the turns it slept."""
+        turn = self._forget_dormant(actor)
+        if turn is not None:
+            actor.fast_forward(self.engine.index - turn)
+            self.scheduler.schedule(actor, self.engine.index + 1)
+
+    def wake_area(self, x: int, y: int, radius: int) -> None:
+        """Wake the dormant actors within `radius` tiles of (x, y), diagonals counting as one."""
+        if not self._dormant:
+            return
+        cells = self._dormant_cells
+        for cell_x in range((x - radius) // DORMANT_CELL_SIZE, (x + radius) // DORMANT_CELL_SIZE + 1):
+            for cell_y in range((y - radius) // DORMANT_CELL_SIZE, (y + radius) // DORMANT_CELL_SIZE + 1):
+                actors = cells.get((cell_x, cell_y))
+                if not actors:
+                    continue
+                for actor in list(actors):
+                    if abs(actor.x - x) <= radius and abs(actor.y - y) <= radius:
+                        self.wake(actor)
+
+    def _forget_dormant(self, entity: Entity) -> Optional[int]:
+        """Stop tracking `entity` as dormant.  Returns the turn it fell asleep on, if it was."""
+        dormant = self._dormant.pop(entity, None)
+        if dormant is None:
+            return None
+        turn, cell = dormant
+        actors = self._dormant_cells[cell]
+        del actors[entity]
+        if not actors:
+            del self._dormant_cells[cell]
+        return turn
+
+    def _set_render_layer(self, entity: Entity, order: Optional[RenderOrder]) -> None:
+        old_order = self._render_layer_of.pop(entity, None)
+        if old_order is not None:
+            del self._render_layers[old_order][entity]
+            self._render_arrays.pop(old_order, None)
+        if order is not None:
+            self._render_layers[order][entity] = None
+            self._render_layer_of[entity] = order
+            self._render_arrays.pop(order, None)
+
+    def _get_render_arrays(self, order: RenderOrder) -> Tuple[np.ndarray, ...]:
+        """Return the x, y, glyph and foreground color arrays of a render layer."""
+        arrays = self._render_arrays.get(order)
+        if arrays is None:
+            layer = self._render_layers[order]
+            count = len(layer)
+            x = np.fromiter((entity.x for entity in layer), dtype=np.intp, count=count)
+            y = np.fromiter((entity.y for entity in layer), dtype=np.intp, count=count)
+            ch = np.fromiter((ord(entity.char) for entity in layer), dtype=np.int32, count=count)
+            fg = np.array([entity.color for entity in layer], dtype=np.uint8).reshape(count, 3)
+            arrays = self._render_arrays[order] = (x, y, ch, fg)
+        return arrays
+
+    def _update_occupancy(self, entity: Entity) -> None:
+        """Sync the occupancy and path cost grids with the entity's position and blocks_movement."""
+        old_position = self._blocker_positions.pop(entity, None)
+        if entity.blocks_movement and entity in self.entities:
+            new_position = (entity.x, entity.y)
+            self._blocker_positions[entity] = new_position
+        else:
+            new_position = None
+
+        if old_position == new_position:
+            return
+        if old_position is not None:
+            self._add_occupancy(*old_position, -1)
+        if new_position is not None:
+            self._add_occupancy(*new_position, 1)
+        self.path_cost_version += 1
+
+    def _add_occupancy(self, x: int, y: int, amount: int) -> None:
+        self.occupancy[x, y] += amount
+        if self.path_cost[x, y]:
+            self.path_cost[x, y] = 1 + 10 * self.occupancy[x, y]
+
+    def update_terrain(self) -> None:
+        """Rebuild the derived grids.  Must be called after `tiles` was modified."""
+        self.path_cost[:] = np.where(self.tiles["walkable"], 1 + 10 * self.occupancy, 0)
+        self.path_cost_version += 1
+        self.terrain_version += 1
+
+    def is_passable(self, x: int, y: int) -> bool:
+        """Return True if the tile is walkable and not held by a blocking entity."""
+        return self.path_cost[x, y] == 1
+
+    def get_entities_at_location(self, x: int, y: int) -> List[Entity]:
+        return self.entity_index.at(x, y)
+
+    def get_entities_in_area(self, x1: int, y1: int, x2: int, y2: int) -> Iterator[Entity]:
+        """Iterate over the entities with x1 <= x < x2 and y1 <= y < y2."""
+        return self.entity_index.in_rect(x1, y1, x2, y2)
+
+    def get_actors_in_area(self, x1: int, y1: int, x2: int, y2: int) -> Iterator[Actor]:
+        """Iterate over the living actors with x1 <= x < x2 and y1 <= y < y2."""
+        for entity in self.entity_index.in_rect(x1, y1, x2, y2):
+            if isinstance(entity, Actor) and entity.is_alive:
+                yield entity
 
     def get_blocking_entity_at_location(self, location_x: int, location_y: int) -> Optional[Entity]:
-        for entity in self.entities:
-            if entity.blocks_movement and entity.x == location_x and entity.y == location_y:
+        for entity in self.entity_index.at(location_x, location_y):
+            if entity.blocks_movement:
                 return entity
 
         return None
 
     def get_actor_at_location(self, x: int, y: int) -> Optional[Actor]:
-        for actor in self.actors:
-            if actor.x == x and actor.y == y:
-                return actor
+        for entity in self.entity_index.at(x, y):
+            if isinstance(entity, Actor) and entity.is_alive:
+                return entity
 
         return None
 
@@ -101,6 +372,18 @@ class GameMap:
         return x-x_low, y-y_low
 
 
+    def _shown_on_screen(
+        self, x: np.ndarray, y: np.ndarray, x_low: int, x_high: int, y_low: int, y_high: int,
+    ) -> np.ndarray:
+        """
+        Return the indices of the positions inside the screen box that are in the FOV.
+
+        The box excludes `x_high` and `y_high`, like the slices of the tiles drawn.
+        """
+        # The box lies within the map, so `visible` is only indexed with positions inside it.
+        inside = np.flatnonzero((x_low <= x) & (x < x_high) & (y_low <= y) & (y < y_high))
+        return inside[self.visible[x[inside], y[inside]]]
+
     def render(self, console: Console) -> None:
         """
         Renders the map.
@@ -126,20 +409,36 @@ class GameMap:
             default=tile_types.SHROUD,
         )
 
-        entities_sorted_for_rendering = sorted(
-            self.entities, key=lambda x: x.render_order.value
-        )
-
-        for entity in entities_sorted_for_rendering:
-            # Only print entities that are in the FOV and on screen
-            if 0 <= entity.x - x_low <= self.window_width and 0 <= entity.y - y_low <= self.window_height:
-                if self.visible[entity.x, entity.y]:
-                    console.print(x=entity.x - x_low, y=entity.y - y_low, string=entity.char, fg=entity.color)
+        # Draw the entities layer by layer, only the ones in the FOV and on screen.
+        tiles = console.tiles_rgb
+        for order in RenderOrder:
+            x, y, ch, fg = self._get_render_arrays(order)
+            if not len(x):
+                continue
+            shown = self._shown_on_screen(x, y, x_low, x_high, y_low, y_high)
+            screen_x = x[shown] - x_low
+            screen_y = y[shown] - y_low
+            tiles["ch"][screen_x, screen_y] = ch[shown]
+            tiles["fg"][screen_x, screen_y] = fg[shown]
+
+        # Projectiles fly above everything else.
+        x, y, ch = self.projectiles.glyphs()
+        if len(x):
+            shown = self._shown_on_screen(x, y, x_low, x_high, y_low, y_high)
+            tiles["ch"][x[shown] - x_low, y[shown] - y_low] = ch[shown]
+            tiles["fg"][x[shown] - x_low, y[shown] - y_low] = LASER_COLOR
 
 
 class GameWorld:
     """
     Holds the settings for the GameMap, and generates new maps when moving down the stairs.
+
+    Star system maps are built the first time they are entered, or in advance for
+    the systems closest to the player when the galaxy is generated.  At most
+    `system_map_budget` of them are kept in memory, besides the current map and
+    the one being entered.  The least recently used ones go over the budget:
+    those with no entity left on them are dropped, and rebuilt identically from
+    their seed when entered again; the others are frozen, see `freeze_map`.
     """
 
     def __init__(
@@ -153,6 +452,8 @@ class GameWorld:
         max_monsters: int,
         min_monsters: int,
         max_items: int,
+        system_map_budget: int = 4,
+        generation_workers: int = 1,
 
         current_map: GameMap = None,
         main_map: GameMap = None,
@@ -173,8 +474,34 @@ class GameWorld:
 
         self.current_map = current_map
         self.main_map = main_map
-        self.stellar_systems = stellar_systems
+        self.stellar_systems = list(stellar_systems)
+
+        self.system_map_budget = system_map_budget
+        self.system_maps: OrderedDict[StellarSystem, GameMap] = OrderedDict()
+
+        # Number of processes used to build system maps in advance.
+        self.generation_workers = generation_workers
+
+        # Save the maps of a loaded game are read from until they are all loaded.
+        self.map_source: Optional[SaveReader] = None
+        # Emptied system maps, encoded as the sections of a save, see `freeze_map`.
+        self.frozen_maps: Dict[GameMap, bytes] = {}
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        # Untouched system maps are rebuilt from their seed, no need to save them.
+        state["system_maps"] = OrderedDict(
+            (system, game_map)
+            for system, game_map in self.system_maps.items()
+            if not self.is_evictable(game_map)
+        )
+        state["map_source"] = None
+        state["frozen_maps"] = {}  # Saved as their sections, see `savefile.snapshot`.
+        return state
 
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.__dict__.setdefault("frozen_maps", {})  # Saved before maps could be frozen.
 
     def generate_galaxy(self) -> None:
         from procgen import generate_space
@@ -189,7 +516,117 @@ class GameWorld:
             map_window_width=self.map_window_width,
             map_window_height=self.map_window_height,
         )
+        self.system_maps.clear()
 
         self.engine.game_map = self.main_map
         self.current_map = self.main_map
 
+        self.prebuild_system_maps()
+
+    def prebuild_system_maps(self) -> None:
+        """
+        Fill the system map cache with the systems closest to the player.
+
+        The terrain of these systems is built in parallel over `generation_workers`
+        processes and then assembled into GameMaps here.
+        """
+        from procgen import build_star_systems_tiles, generate_star_system
+
+        player = self.engine.player
+        free_slots = self.system_map_budget - len(self.system_maps)
+        pending = sorted(
+            (system for system in self.stellar_systems if system not in self.system_maps),
+            key=lambda system: (system.x - player.x)**2 + (system.y - player.y)**2,
+        )[:max(free_slots, 0)]
+
+        tile_layers = build_star_systems_tiles(pending, max_workers=self.generation_workers)
+
+        for system, tile_layer in zip(pending, tile_layers):
+            self.system_maps[system] = generate_star_system(
+                engine=self.engine,
+                window_width=self.map_window_width,
+                window_height=self.map_window_height,
+                stellar_system=system,
+                tile_layer=tile_layer,
+            )
+
+    def get_system_map(self, system: StellarSystem) -> GameMap:
+        """Return the map of a stellar system, building it if it is not loaded."""
+        game_map = self.system_maps.get(system)
+
+        if game_map is None:
+            from procgen import generate_star_system
+
+            game_map = generate_star_system(
+                engine=self.engine,
+                window_width=self.map_window_width,
+                window_height=self.map_window_height,
+                stellar_system=system,
+            )
+            self.system_maps[system] = game_map
+        else:
+            self.load_map(game_map)
+            self.system_maps.move_to_end(system)
+
+        self.evict_system_maps(keep=game_map)
+        return game_map
+
+    def is_loaded(self, game_map: GameMap) -> bool:
+        """Return False for frozen maps, and the maps of a loaded game that are still only in the save."""
+        return game_map not in self.frozen_maps and (
+            self.map_source is None or game_map not in self.map_source.pending
+        )
+
+    def load_map(self, game_map: GameMap) -> GameMap:
+        """Make sure a frozen map or a map of a loaded game was read back, and return it."""
+        data = self.frozen_maps.get(game_map)
+        if data is not None:
+            import savefile
+
+            savefile.thaw_map(self, game_map, data)
+            del self.frozen_maps[game_map]
+        if self.map_source is not None:
+            self.map_source.load_map(game_map)
+            if not self.map_source.pending:
+                self.map_source = None
+        return game_map
+
+    def is_evictable(self, game_map: GameMap) -> bool:
+        """Return True if the map can be rebuilt from its seed without losing anything."""
+        return (
+            game_map is not self.engine.game_map
+            and self.is_loaded(game_map)
+            and game_map.terrain_recipe is not None
+            and not game_map.entities
+            and not game_map.projectiles
+        )
+
+    def evict_system_maps(self, keep: Optional[GameMap] = None) -> None:
+        """Drop or freeze the least recently used system maps in memory that go over the budget."""
+        loaded = [game_map for game_map in self.system_maps.values() if self.is_loaded(game_map)]
+        excess = len(loaded) - self.system_map_budget
+
+        for system, game_map in list(self.system_maps.items()):
+            if excess <= 0:
+                break
+            if game_map is keep or game_map is self.engine.game_map or not self.is_loaded(game_map):
+                continue
+            if self.is_evictable(game_map):
+                del self.system_maps[system]
+            else:
+                self.freeze_map(game_map)
+            excess -= 1
+
+    def freeze_map(self, game_map: GameMap) -> None:
+        """
+        Free the memory of a system map that cannot be rebuilt from its seed alone.
+
+        The map is encoded as it would be in a save: its entities, and only the tiles
+        that differ from its terrain recipe.  The GameMap object is emptied, but stays
+        the one its entities and the rest of the game refer to, and `load_map` fills it
+        in again.
+        """
+        import savefile
+
+        self.frozen_maps[game_map] = savefile.freeze_map(self, game_map)
+        game_map.__dict__.clear()
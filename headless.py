@@ -0,0 +1,206 @@
+"""
+Run the game without a window, an autopilot playing, and print turns per second.
+
+Every turn the autopilot picks the player's action, which is performed
+followed by `Engine.main_turns_cycle` and `Engine.update_fov`, as
+`EventHandler.handle_action` does for a key press.  Nothing is rendered and
+nothing is written to disk.
+
+    python headless.py --turns 1000 --seed 0
+    python headless.py --policy gunner --ships 100 --immortal
+    python headless.py --load savegame.sav --policy wander
+    python headless.py --policy my_module:MyAutopilot
+    python headless.py --ships 500 --trace trace.json
+
+Policies are the names in POLICIES, or `module:attribute` paths to an
+Autopilot subclass.  `--trace` writes a trace of the run, see `tracing`.
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import random
+import time
+from typing import Dict, Optional, Type, TYPE_CHECKING
+
+import numpy as np
+
+from actions import Action, BumpAction, WaitAction
+import entity_factories
+import exceptions
+import setup_game
+from spawn_actions import ShootAction
+from tracing import span, tracer
+
+if TYPE_CHECKING:
+    from engine import Engine
+    from entity import Actor
+
+DIRECTIONS = [(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
+
+
+class Autopilot:
+    """Plays the player: `next_action` is asked for the player's action every turn."""
+
+    def __init__(self, engine: Engine, rng: random.Random):
+        self.engine = engine
+        self.rng = rng
+
+    def next_action(self) -> Action:
+        raise NotImplementedError()
+
+
+class WaitAutopilot(Autopilot):
+    """Never moves, the rest of the galaxy comes to the player."""
+
+    def next_action(self) -> Action:
+        return WaitAction(self.engine.player)
+
+
+class WanderAutopilot(Autopilot):
+    """Flies in a random direction, keeping it for a few turns."""
+
+    def __init__(self, engine: Engine, rng: random.Random):
+        super().__init__(engine, rng)
+        self.direction = rng.choice(DIRECTIONS)
+
+    def next_action(self) -> Action:
+        if self.rng.random() < 0.2:
+            self.direction = self.rng.choice(DIRECTIONS)
+        return BumpAction(self.engine.player, *self.direction)
+
+
+class GunnerAutopilot(WanderAutopilot):
+    """Shoots at the closest ship in sight, lining up with it first; wanders if there is none."""
+
+    def closest_target(self) -> Optional[Actor]:
+        engine = self.engine
+        player = engine.player
+        game_map = engine.game_map
+        half_width, half_height = game_map.window_width // 2, game_map.window_height // 2
+
+        targets = [
+            actor
+            for actor in game_map.get_actors_in_area(
+                player.x - half_width, player.y - half_height, player.x + half_width + 1, player.y + half_height + 1,
+            )
+            if actor is not player and game_map.visible[actor.x, actor.y]
+        ]
+        return min(targets, key=lambda actor: player.distance(actor.x, actor.y), default=None)
+
+    def next_action(self) -> Action:
+        player = self.engine.player
+        target = self.closest_target()
+        if target is None:
+            return super().next_action()
+
+        dx, dy = target.x - player.x, target.y - player.y
+        if dx == 0 or dy == 0:
+            return ShootAction(player, int(np.sign(dx)), int(np.sign(dy)))
+        # Line up along the axis that is closer to it.
+        if abs(dx) < abs(dy):
+            return BumpAction(player, int(np.sign(dx)), 0)
+        return BumpAction(player, 0, int(np.sign(dy)))
+
+
+POLICIES: Dict[str, Type[Autopilot]] = {
+    "wait": WaitAutopilot,
+    "wander": WanderAutopilot,
+    "gunner": GunnerAutopilot,
+}
+
+
+def get_policy(name: str) -> Type[Autopilot]:
+    """Return the autopilot called `name` in POLICIES, or at the `module:attribute` path `name`."""
+    if ":" in name:
+        module, attribute = name.split(":", 1)
+        return getattr(importlib.import_module(module), attribute)
+    return POLICIES[name]
+
+
+def add_ships(engine: Engine, count: int, rng: random.Random) -> None:
+    """Spawn `count` hostile ships around the player, within twice the screen size."""
+    game_map = engine.game_map
+    player = engine.player
+    added = 0
+    while added < count:
+        x = player.x + rng.randint(-game_map.window_width, game_map.window_width)
+        y = player.y + rng.randint(-game_map.window_height, game_map.window_height)
+        if game_map.in_bounds(x, y) and game_map.is_passable(x, y):
+            entity_factories.spawn(rng.choice(["skirmisher", "fighter"]), game_map, x, y)
+            added += 1
+
+
+def play_turn(engine: Engine, autopilot: Autopilot) -> None:
+    """Play one turn, as EventHandler.handle_action does.  Impossible actions count as waiting."""
+    player = engine.player
+    action = autopilot.next_action()
+    with span(type(action).__name__, "player", args={"turn": engine.index + 1}):
+        player.stored_action = action
+        try:
+            action.perform()
+        except exceptions.Impossible:
+            player.stored_action = WaitAction(player)
+
+        engine.main_turns_cycle()
+        engine.update_fov()
+
+
+def run(engine: Engine, autopilot: Autopilot, turns: int) -> int:
+    """Play up to `turns` turns, stopping early if the player dies.  Returns the turns played."""
+    for turn in range(turns):
+        if not engine.player.is_alive:
+            return turn
+        play_turn(engine, autopilot)
+    return turns
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--policy", default="wander", help=f"one of {', '.join(POLICIES)}, or module:attribute")
+    parser.add_argument("--load", metavar="SAVE", help="start from a save instead of a new game")
+    parser.add_argument("--ships", type=int, default=0, help="hostile ships to add around the player")
+    parser.add_argument("--immortal", action="store_true", help="keep the player from dying")
+    parser.add_argument("--trace", metavar="FILE", help="trace the turns and write the trace to FILE")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+
+    start = time.perf_counter()
+    engine = setup_game.load_game(args.load) if args.load else setup_game.new_game()
+    setup_time = time.perf_counter() - start
+    # Leave the save and the message archive on disk alone.
+    engine.autosaver = None
+    engine.message_log.archive = None
+    if args.immortal:
+        engine.player.fighter.max_hp = engine.player.fighter.hp = 10**9
+
+    rng = random.Random(args.seed)
+    add_ships(engine, args.ships, rng)
+    autopilot = get_policy(args.policy)(engine, rng)
+
+    if args.trace:
+        tracer.start()
+    start = time.perf_counter()
+    played = run(engine, autopilot, args.turns)
+    seconds = time.perf_counter() - start
+    tracer.stop()
+
+    print(f"{'loaded' if args.load else 'generated'} the game in {setup_time:.2f} s")
+    print(
+        f"{played} turns in {seconds:.2f} s: {played / seconds:.1f} turns/s "
+        f"({args.policy} autopilot, seed {args.seed})"
+    )
+    print(
+        f"player {'alive' if engine.player.is_alive else 'dead'} with {engine.player.fighter.hp} hp, "
+        f"{len(engine.game_map.actors) - 1} other ships on the map"
+    )
+    if args.trace:
+        print(f"trace of {tracer.dump(args.trace)} spans written to {args.trace}")
+
+
+if __name__ == "__main__":
+    main()
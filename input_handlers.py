@@ -10,10 +10,14 @@ import tcod.event
 import actions
 from actions import Action, BumpAction, WaitAction, PickupAction, LootAction
 from spawn_actions import ShootAction
+from entity import Actor
 
 
 import color
 import exceptions
+from timers import timers
+import tracing
+from tracing import span, tracer
 
 if TYPE_CHECKING:
     from engine import Engine
@@ -144,20 +148,22 @@ class EventHandler(BaseEventHandler):
         else:
             self.engine.player.stored_action = action
 
-        
-        
-        try:
-            self.engine.player.stored_action.perform()
-        except exceptions.Impossible as exc:
-            self.engine.message_log.add_message(exc.args[0], color.impossible)
-            return False  # Skip enemy turn on exceptions.
-        
+        with span(type(action).__name__, "player", "handle_action", {"turn": self.engine.index + 1}):
+            try:
+                self.engine.player.stored_action.perform()
+            except exceptions.Impossible as exc:
+                self.engine.message_log.add_message(exc.args[0], color.impossible)
+                return False  # Skip enemy turn on exceptions.
+
+            self.engine.main_turns_cycle()
+            #self.engine.handle_enemy_turns()
+            #self.engine.handle_effects_turns()
 
-        self.engine.main_turns_cycle()
-        #self.engine.handle_enemy_turns()
-        #self.engine.handle_effects_turns()
+            self.engine.update_fov()
 
-        self.engine.update_fov()
+            # A finished game is not saved, see GameOverEventHandler.
+            if self.engine.autosaver is not None and self.engine.player.is_alive:
+                self.engine.autosaver.on_turn(self.engine)
         return True
 
     def ev_mousemotion(self, event: tcod.event.MouseMotion) -> None:
@@ -259,8 +265,8 @@ class LootEventHandler(AskUserEventHandler):
         player = self.engine.player
 
         
-        for actor in set(game_map.corpses):
-            if actor.x == x and actor.y == y:
+        for actor in game_map.get_entities_at_location(x, y):
+            if isinstance(actor, Actor) and not actor.is_alive:
                 return actor
 
         return None
@@ -601,17 +607,37 @@ class MainGameEventHandler(EventHandler):
             # to be implemented
             #self.engine.event_handler = HelpHandler(self.engine)
             pass
+        elif key == tcod.event.K_F3:
+            timers.toggle()  # Shows or hides the performance overlay.
+        elif key == tcod.event.K_F4:
+            toggle_tracing(self.engine)
 
 
         # No valid key was pressed
         return action
 
 
+def toggle_tracing(engine: Engine) -> None:
+    """Start tracing, or stop it and write the trace to tracing.TRACE_FILENAME."""
+    if not tracer.enabled:
+        tracer.start()
+        engine.message_log.add_message(f"Tracing, F4 again to write the trace to {tracing.TRACE_FILENAME}.")
+        return
+    tracer.stop()
+    count = tracer.dump(tracing.TRACE_FILENAME)
+    engine.message_log.add_message(f"Trace of {count} spans written to {tracing.TRACE_FILENAME}.")
+
+
 class GameOverEventHandler(EventHandler):
     def on_quit(self) -> None:
         """Handle exiting out of a finished game."""
+        if self.engine.autosaver is not None:
+            # Or the autosave being written would bring the save back.
+            self.engine.autosaver.wait()
         if os.path.exists("savegame.sav"):
             os.remove("savegame.sav")  # Deletes the active save file.
+        if self.engine.message_log.archive is not None:
+            self.engine.message_log.archive.delete()
         raise exceptions.QuitWithoutSaving()  # Avoid saving a finished game.
 
     def ev_quit(self, event: tcod.event.Quit) -> None:
@@ -639,18 +665,48 @@ CURSOR_Y_KEYS = {
 }
 
 
+# Color filters of the history search, cycled through with C.
+SEARCH_COLORS = [
+    ("any color", None),
+    ("white", color.white),
+    ("enemy deaths", color.enemy_die),
+    ("your death", color.player_die),
+    ("travel", color.descend),
+    ("healing", color.health_recovered),
+    ("status effects", color.status_effect_applied),
+    ("targeting", color.needs_target),
+    ("errors", color.error),
+    ("welcome", color.welcome_text),
+]
+
+
 class HistoryViewer(EventHandler):
-    """Print the history on a larger window which can be navigated."""
+    """
+    Print the history on a larger window which can be navigated.
+
+    / starts typing a search, Enter looks for it, N finds the next older match and
+    Shift+N the next newer one.  C cycles through the color filters of the search.
+    """
 
     def __init__(self, engine: Engine):
         super().__init__(engine)
-        self.log_length = len(engine.message_log.messages)
+        self.log_length = len(engine.message_log)
         self.cursor = self.log_length - 1
+        self.log_console: Optional[tcod.Console] = None
+
+        self.search_text = ""
+        self.search_color = 0  # Index in SEARCH_COLORS.
+        self.typing = False
+        self.status = ""
 
     def on_render(self, console: tcod.Console) -> None:
         super().on_render(console)  # Draw the main state as the background.
 
-        log_console = tcod.Console(console.width - 6, console.height - 6)
+        width, height = console.width - 6, console.height - 6
+        if self.log_console is None or (self.log_console.width, self.log_console.height) != (width, height):
+            self.log_console = tcod.Console(width, height)
+        log_console = self.log_console
+        log_console.clear()
 
         # Draw a frame with a custom banner title.
         log_console.draw_frame(0, 0, log_console.width, log_console.height)
@@ -659,17 +715,47 @@ class HistoryViewer(EventHandler):
         )
 
         # Render the message log using the cursor parameter.
-        self.engine.message_log.render_messages(
-            log_console,
-            1,
-            1,
-            log_console.width - 2,
-            log_console.height - 2,
-            self.engine.message_log.messages[: self.cursor + 1],
+        self.engine.message_log.render(
+            log_console, 1, 1, log_console.width - 2, log_console.height - 2, stop=self.cursor + 1,
         )
+
+        if self.typing or self.search_text or self.search_color:
+            search = f"┤Search: {self.search_text}{'_' if self.typing else ''} ({SEARCH_COLORS[self.search_color][0]})"
+            if self.status:
+                search += f" {self.status}"
+            log_console.print(2, log_console.height - 1, f"{search}├"[:log_console.width - 4])
         log_console.blit(console, 3, 3)
 
+    def search(self, backward: bool = True) -> None:
+        """Move the cursor to the next message matching the search."""
+        found = self.engine.message_log.search(
+            self.search_text, SEARCH_COLORS[self.search_color][1], self.cursor, backward,
+        )
+        if found is None:
+            self.status = "not found"
+        else:
+            self.status = ""
+            self.cursor = found
+
+    def ev_textinput(self, event: tcod.event.TextInput) -> None:
+        if self.typing:
+            self.search_text += event.text
+        elif event.text == "/":
+            self.search_text = ""
+            self.status = ""
+            self.typing = True
+
     def ev_keydown(self, event: tcod.event.KeyDown) -> Optional[MainGameEventHandler]:
+        if self.typing:
+            if event.sym in CONFIRM_KEYS:
+                self.typing = False
+                self.search()
+            elif event.sym == tcod.event.K_BACKSPACE:
+                self.search_text = self.search_text[:-1]
+            elif event.sym == tcod.event.K_ESCAPE:
+                self.typing = False
+            return None
+
         # Fancy conditional movement to make it feel right.
         if event.sym in CURSOR_Y_KEYS:
             adjust = CURSOR_Y_KEYS[event.sym]
@@ -686,6 +772,13 @@ class HistoryViewer(EventHandler):
             self.cursor = 0  # Move directly to the top message.
         elif event.sym == tcod.event.K_END:
             self.cursor = self.log_length - 1  # Move directly to the last message.
+        elif event.sym == tcod.event.K_SLASH:
+            pass  # Typing starts on the text input of the slash, see ev_textinput.
+        elif event.sym == tcod.event.K_n:
+            self.search(backward=not event.mod & tcod.event.KMOD_SHIFT)
+        elif event.sym == tcod.event.K_c:
+            self.search_color = (self.search_color + 1) % len(SEARCH_COLORS)
+            self.status = ""
         else:  # Any other key moves back to the main game state.
             return MainGameEventHandler(self.engine)
         return None
@@ -5,13 +5,27 @@ import exceptions
 import input_handlers
 import setup_game
 import color
+import tracing
+from tracing import span, tracer
 
 
 def save_game(handler: input_handlers.BaseEventHandler, filename: str) -> None:
     """If the current event handler has an active Engine then save it."""
     if isinstance(handler, input_handlers.EventHandler):
-        handler.engine.save_as(filename)
-        print("Game saved.")
+        report = handler.engine.save_as(filename)
+        print(f"Game saved ({report}).")
+
+
+def dump_trace() -> None:
+    """If the game is being traced, write what led up to a crash for inspection."""
+    if not tracer.enabled:
+        return
+    try:
+        count = tracer.dump(tracing.CRASH_TRACE_FILENAME)
+    except OSError:  # Not worth hiding the crash itself for.
+        traceback.print_exc()
+        return
+    print(f"Trace of {count} spans written to {tracing.CRASH_TRACE_FILENAME}.")
 
 
 def main() -> None:
@@ -34,9 +48,11 @@ def main() -> None:
         root_console = tcod.Console(screen_width, screen_height, order="F")
         try:
             while True:
-                root_console.clear()
-                handler.on_render(console=root_console)
-                context.present(root_console)
+                with span("frame", "render", "frame"):
+                    root_console.clear()
+                    handler.on_render(console=root_console)
+                    with span("present", "render", "present"):
+                        context.present(root_console)
 
                 try:
                     for event in tcod.event.wait():
@@ -44,6 +60,7 @@ def main() -> None:
                         handler = handler.handle_events(event)
                 except Exception:  # Handle exceptions in game.
                     traceback.print_exc()  # Print error to stderr.
+                    dump_trace()
                     # Then print the error to the message log.
                     if isinstance(handler, input_handlers.EventHandler):
                         handler.engine.message_log.add_message(
@@ -52,10 +69,11 @@ def main() -> None:
         except exceptions.QuitWithoutSaving:
             raise
         except SystemExit:  # Save and quit.
-            save_game(handler, 'savegame.sav')
+            save_game(handler, setup_game.SAVE_FILENAME)
             raise
         except BaseException:  # Save on any other unexpected exception.
-            save_game(handler, "savegame.sav")
+            dump_trace()
+            save_game(handler, setup_game.SAVE_FILENAME)
             raise
 
 if __name__ == '__main__':
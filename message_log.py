@@ -1,12 +1,20 @@
-from typing import Iterable, List, Reversible, Tuple
+import bisect
+from collections import deque, OrderedDict
+import itertools
+import os
+import struct
+from typing import BinaryIO, Deque, Dict, Iterable, List, Optional, Reversible, Tuple
 import textwrap
 
 import tcod
 
 import color
+from slotted import Slotted
 
 
-class Message:
+class Message(Slotted):
+    __slots__ = ("plain_text", "fg", "count")
+
     def __init__(self, text: str, fg: Tuple[int, int, int]):
         self.plain_text = text
         self.fg = fg
@@ -20,9 +28,260 @@ class Message:
         return self.plain_text
 
 
+class MessageArchive:
+    """
+    The messages that fell out of a MessageLog, in a file on disk.
+
+    Records are appended to `path`: the color, the count and the UTF-8 text of a
+    message.  `path` + ".idx" holds where every record ends as a 64 bit integer,
+    so that any message, or run of messages, is found with two seeks whatever the
+    size of the archive.
+
+    Only the record count goes into saves.  Records written after a save are cut off
+    when it is loaded, and a count of 0 starts a new, empty archive.
+    """
+
+    _RECORD = struct.Struct("<3BII")  # r, g, b, count, text length
+    _OFFSET = struct.Struct("<Q")
+
+    # Records read at a time by `search`.
+    SEARCH_CHUNK = 4096
+
+    def __init__(self, path: str, count: int = 0):
+        self.path = path
+        self.count = count
+        self._data: Optional[BinaryIO] = None
+        self._index: Optional[BinaryIO] = None
+
+    def __getstate__(self) -> dict:
+        return {"path": self.path, "count": self.count}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["path"], state["count"])  # type: ignore
+        # The files may have been lost or cut short since the save.
+        self.count = self._available(self.count)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _available(self, count: int) -> int:
+        """Return how many of the first `count` records are whole in the files."""
+        if not os.path.exists(self.path) or not os.path.exists(self.path + ".idx"):
+            return 0
+        count = min(count, os.path.getsize(self.path + ".idx") // self._OFFSET.size)
+        if not count:
+            return 0
+
+        size = os.path.getsize(self.path)
+        with open(self.path + ".idx", "rb") as index:
+            index.seek((count - 1) * self._OFFSET.size)
+            if self._OFFSET.unpack(index.read(self._OFFSET.size))[0] <= size:
+                return count
+            # The data was cut short: keep the records that end within it.
+            index.seek(0)
+            ends = [end for end, in self._OFFSET.iter_unpack(index.read(count * self._OFFSET.size))]
+        return bisect.bisect_right(ends, size)
+
+    def _open(self) -> None:
+        """Open the files, dropping the records past `count`."""
+        self.count = self._available(self.count)
+        self._data = open(self.path, "a+b")
+        self._index = open(self.path + ".idx", "a+b")
+
+        self._index.truncate(self.count * self._OFFSET.size)
+        self._data.truncate(self._bounds(self.count, self.count)[-1])
+
+    def _bounds(self, start: int, stop: int) -> List[int]:
+        """Return where records `start` to `stop` begin, followed by where the last one ends."""
+        first = max(start - 1, 0)
+        self._index.seek(first * self._OFFSET.size)
+        data = self._index.read((stop - first) * self._OFFSET.size)
+        ends = [end for end, in self._OFFSET.iter_unpack(data)]
+        return [0] + ends if start == 0 else ends
+
+    def append(self, message: Message) -> None:
+        if self._data is None:
+            self._open()
+        text = message.plain_text.encode("utf-8")
+        self._data.seek(0, os.SEEK_END)
+        self._data.write(self._RECORD.pack(*message.fg, message.count, len(text)) + text)
+        self._data.flush()
+        self._index.write(self._OFFSET.pack(self._data.tell()))
+        self._index.flush()
+        self.count += 1
+
+    def read(self, start: int, stop: int) -> List[Message]:
+        """Return the archived messages `start` to `stop`."""
+        start, stop = max(0, start), min(stop, self.count)
+        if start >= stop:
+            return []
+        if self._data is None:
+            self._open()
+
+        bounds = self._bounds(start, stop)
+        self._data.seek(bounds[0])
+        data = self._data.read(bounds[-1] - bounds[0])
+
+        messages = []
+        for offset in bounds[:-1]:
+            position = offset - bounds[0]
+            r, g, b, count, length = self._RECORD.unpack_from(data, position)
+            position += self._RECORD.size
+            message = Message(data[position:position + length].decode("utf-8"), (r, g, b))
+            message.count = count
+            messages.append(message)
+        return messages
+
+    def search(
+        self, text: str, fg: Optional[Tuple[int, int, int]], start: int, stop: int, backward: bool = True,
+    ) -> Optional[int]:
+        """
+        Return the last archived message of `start` to `stop` (the first one if not
+        `backward`) whose text contains `text`, and whose color is `fg` unless it is None.
+
+        The records are read a chunk at a time and `text` is looked for in the encoded
+        data directly, so only the records it is found in are unpacked.  The case of
+        ASCII letters is ignored.
+        """
+        start, stop = max(0, start), min(stop, self.count)
+        if start >= stop:
+            return None
+        if self._data is None:
+            self._open()
+        needle = text.encode("utf-8").lower()
+
+        chunks = range(start, stop, self.SEARCH_CHUNK)
+        for chunk_start in reversed(chunks) if backward else chunks:
+            bounds = self._bounds(chunk_start, min(chunk_start + self.SEARCH_CHUNK, stop))
+            self._data.seek(bounds[0])
+            data = self._data.read(bounds[-1] - bounds[0])
+            offsets = [offset - bounds[0] for offset in bounds]
+
+            if needle:
+                # Records the text is found in, each found once.
+                records = []
+                lowered = data.lower()
+                position = lowered.find(needle)
+                while position != -1:
+                    record = bisect.bisect_right(offsets, position) - 1
+                    text_start = offsets[record] + self._RECORD.size
+                    if text_start <= position and position + len(needle) <= offsets[record + 1]:
+                        records.append(record)
+                        position = lowered.find(needle, offsets[record + 1])
+                    else:  # In a record header or across two records.
+                        position = lowered.find(needle, position + 1)
+            else:
+                records = range(len(offsets) - 1)
+
+            for record in reversed(records) if backward else records:
+                if fg is None or self._RECORD.unpack_from(data, offsets[record])[:3] == tuple(fg):
+                    return chunk_start + record
+        return None
+
+    def close(self) -> None:
+        for file in (self._data, self._index):
+            if file is not None:
+                file.close()
+        self._data = self._index = None
+
+    def delete(self) -> None:
+        """Remove the archive files."""
+        self.close()
+        self.count = 0
+        for path in (self.path, self.path + ".idx"):
+            if os.path.exists(path):
+                os.remove(path)
+
+
 class MessageLog:
-    def __init__(self) -> None:
-        self.messages: List[Message] = []
+    """
+    The game messages.
+
+    Only the last `capacity` messages are kept in `messages`.  Older ones go to
+    `archive`, if the log has one, and are dropped otherwise.  `history` and
+    `search` read from both.
+
+    The wrapped lines of the messages rendered lately are cached per width, keyed by
+    their index in the history plus the number of messages dropped before them,
+    which stays the same while the message is kept.  A message is wrapped again
+    only when its count changes, so rendering costs as much as the lines shown.
+    """
+
+    # Wrapped messages kept per width.
+    WRAP_CACHE_SIZE = 4096
+
+    def __init__(self, capacity: int = 1000, archive: Optional[MessageArchive] = None) -> None:
+        self.messages: Deque[Message] = deque(maxlen=capacity)
+        self.archive = archive
+        self.dropped = 0  # Messages dropped for lack of an archive.
+        # {width: {history index + dropped: (count, color, lines)}}
+        self._wrapped: Dict[int, OrderedDict] = {}
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_wrapped"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._wrapped = {}
+        self.__dict__.setdefault("dropped", 0)
+        if not isinstance(self.messages, deque):  # Saved before the log was bounded.
+            self.messages = deque(self.messages, maxlen=1000)
+            self.archive = None
+
+    def __len__(self) -> int:
+        """The number of messages in the history, archived ones included."""
+        archived = len(self.archive) if self.archive is not None else 0
+        return archived + len(self.messages)
+
+    def history(self, start: int, stop: int) -> List[Message]:
+        """Return messages `start` to `stop` of the history, see `__len__`."""
+        start = max(start, 0)
+        archived = len(self.archive) if self.archive is not None else 0
+        messages = self.archive.read(start, stop) if start < archived else []
+        if stop > archived:
+            messages.extend(itertools.islice(self.messages, max(start - archived, 0), stop - archived))
+        return messages
+
+    def search(
+        self,
+        text: str = "",
+        fg: Optional[Tuple[int, int, int]] = None,
+        start: Optional[int] = None,
+        backward: bool = True,
+    ) -> Optional[int]:
+        """
+        Return the index of the nearest message before `start` (after it if not
+        `backward`) whose text contains `text`, ignoring case, and whose color is `fg`
+        unless it is None.  Returns None if there is no such message.
+
+        `start` defaults to the end of the history.
+        """
+        length = len(self)
+        archived = length - len(self.messages)
+        if start is None:
+            start = length
+        text = text.lower()
+
+        def matches(message: Message) -> bool:
+            return (fg is None or tuple(message.fg) == tuple(fg)) and text in message.plain_text.lower()
+
+        if backward:
+            for i in range(min(start, length) - 1, archived - 1, -1):
+                if matches(self.messages[i - archived]):
+                    return i
+            if self.archive is not None:
+                return self.archive.search(text, fg, 0, start, backward=True)
+        else:
+            if self.archive is not None and start + 1 < archived:
+                found = self.archive.search(text, fg, start + 1, archived, backward=False)
+                if found is not None:
+                    return found
+            for i in range(max(start + 1, archived), length):
+                if matches(self.messages[i - archived]):
+                    return i
+        return None
 
     def add_message(
         self, text: str, fg: Tuple[int, int, int] = color.white, *, stack: bool = True,
@@ -35,16 +294,65 @@ class MessageLog:
         if stack and self.messages and text == self.messages[-1].plain_text:
             self.messages[-1].count += 1
         else:
+            if len(self.messages) == self.messages.maxlen:
+                if self.archive is not None:
+                    self.archive.append(self.messages[0])
+                else:
+                    self.dropped += 1
             self.messages.append(Message(text, fg))
 
     def render(
         self, console: tcod.Console, x: int, y: int, width: int, height: int,
+        stop: Optional[int] = None,
     ) -> None:
         """Render this log over the given area.
         `x`, `y`, `width`, `height` is the rectangular region to render onto
         the `console`.
+        The messages before the history index `stop`, all of them by default, are
+        rendered starting at the last one and working backwards.
         """
-        self.render_messages(console, x, y, width, height, self.messages)
+        if stop is None or stop > len(self):
+            stop = len(self)
+        # Every message takes at least a line.
+        wrapped = self.wrapped(max(0, stop - height), stop, width)
+
+        y_offset = height - 1
+        for _, fg, lines in reversed(wrapped):
+            for line in reversed(lines):
+                console.print(x=x, y=y + y_offset, string=line, fg=fg)
+                y_offset -= 1
+                if y_offset < 0:
+                    return  # No more space to print messages.
+
+    def wrapped(self, start: int, stop: int, width: int) -> List[Tuple[int, Tuple[int, int, int], List[str]]]:
+        """Return the count, color and lines wrapped to `width` of messages `start` to `stop`."""
+        cache = self._wrapped.setdefault(width, OrderedDict())
+        archived = len(self) - len(self.messages)
+        dropped = self.dropped  # Only ever non zero without an archive.
+
+        missing = [i for i in range(start, min(stop, archived)) if i not in cache]
+        if missing:
+            messages = self.archive.read(missing[0], missing[-1] + 1)
+            for i, message in enumerate(messages, missing[0]):
+                cache[i] = (message.count, message.fg, list(self.wrap(message.full_text, width)))
+
+        wrapped = []
+        for i in range(start, stop):
+            key = i + dropped
+            entry = cache.get(key)
+            if i >= archived:
+                # Messages still in the log can stack.
+                message = self.messages[i - archived]
+                if entry is None or entry[0] != message.count:
+                    entry = cache[key] = (message.count, message.fg, list(self.wrap(message.full_text, width)))
+            elif entry is None:
+                continue  # Not in the archive any more.
+            cache.move_to_end(key)
+            wrapped.append(entry)
+
+        while len(cache) > self.WRAP_CACHE_SIZE:
+            cache.popitem(last=False)
+        return wrapped
 
     @staticmethod
     def wrap(string: str, width: int) -> Iterable[str]:
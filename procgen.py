@@ -1,13 +1,14 @@
 from __future__ import annotations
 
-from typing import Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
 import numpy as np
 import copy
 
 import entity_factories
 from game_map import GameMap
 import tile_types
-from components.stellar_system import Star, StellarSystem, Planet
+from components.stellar_system import Star, StellarSystem, Planet, TERRAIN_STREAM, ring_mask
 
 from typing import TYPE_CHECKING
 
@@ -38,6 +39,64 @@ class RectangularRoom:
 
 
 
+class SpaceTerrain:
+    """
+    Recipe of the galaxy map terrain: a starfield drawn from `seed` and the stars on it.
+
+    Kept on the map as its `terrain_recipe`, so that saves only need the tiles that
+    changed since it was built.
+    """
+
+    def __init__(self, map_width: int, map_height: int, seed: int):
+        self.map_width = map_width
+        self.map_height = map_height
+        self.seed = seed
+        # (x, y, r, palette index of the tile) of every star, in the order they were placed.
+        self.stars: List[Tuple[int, int, int, int]] = []
+
+    def add_star(self, star: Star) -> None:
+        self.stars.append((star.x, star.y, star.r, tile_types.palette_index(star.tile)))
+
+    def build(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the tiles and the system exit mask of the map."""
+        map_width, map_height = self.map_width, self.map_height
+
+        rng = np.random.RandomState(self.seed)
+        layer = np.full((map_width, map_height), tile_types.palette_index(tile_types.floor), dtype=np.uint8, order="F")
+        layer[rng.random(size=layer.shape) >= 0.95] = tile_types.palette_index(tile_types.floor_star)
+
+        system_exit_location = np.full((map_width, map_height), False, order="F")
+        for x, y, r, tile in self.stars:
+            layer[ring_mask(map_width, map_height, x, y, r)] = tile
+            system_exit_location ^= ring_mask(map_width, map_height, x, y, r+2, r_inner=r-1)
+
+        return np.asfortranarray(tile_types.palette[layer]), system_exit_location
+
+
+class SystemTerrain:
+    """Recipe of the terrain of a stellar system map, see `build_star_system_tiles`."""
+
+    def __init__(self, stellar_system: StellarSystem):
+        self.stellar_system = stellar_system
+
+    def build(self, tile_layer: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the tiles and the system exit mask of the map.
+
+        `tile_layer` is the output of `build_star_system_tiles` if it was already built.
+        """
+        map_width = self.stellar_system.map_width
+        map_height = self.stellar_system.map_height
+
+        if tile_layer is None:
+            tile_layer = build_star_system_tiles(self.stellar_system)
+
+        # The exit is the strip along the right edge.
+        system_exit_location = np.full((map_width, map_height), False, order="F")
+        system_exit_location[map_width-10:map_width, 0:map_height] = True
+
+        return np.asfortranarray(tile_types.palette[tile_layer]), system_exit_location
+
 
 def place_entities(
     stars: Star, 
@@ -50,13 +109,17 @@ def place_entities(
     number_of_monsters = np.random.randint(minimum_monsters, maximum_monsters)
     number_of_items = np.random.randint(0, maximum_items)
 
+    star_area = np.full((space.width, space.height), False, order="F")
+    for s in stars:
+        star_area |= s.inner(space.width, space.height)
+
     for i in range(number_of_monsters):
         x = np.random.randint(0, space.width)
         y = np.random.randint(0, space.height)
 
 
-        if not any(entity.x == x and entity.y == y for entity in space.entities) \
-           and not any(s.inner(space.width, space.height)[x,y] for s in stars):
+        if not space.get_entities_at_location(x, y) \
+           and not star_area[x, y]:
             if np.random.random() < 0.8:
                 entity_factories.skirmisher.spawn(space, x, y)
             else:
@@ -66,8 +129,8 @@ def place_entities(
         x = np.random.randint(0, space.width)
         y = np.random.randint(0, space.height)
 
-        if not any(entity.x == x and entity.y == y for entity in space.entities) \
-           and not any(s.inner(space.width, space.height)[x,y] for s in stars):
+        if not space.get_entities_at_location(x, y) \
+           and not star_area[x, y]:
             item_chance = np.random.random()
 
             if item_chance < 0.7:
@@ -80,7 +143,7 @@ def place_entities(
                 entity_factories.lightning_scroll.spawn(space, x, y)
 
     for entity in set(space.actors)-{player}:
-        entity.inventory.add(entity_factories.repair_kit)
+        entity.inventory.add(entity_factories.repair_kit.clone())
 
     
 def generate_space(map_width: int, 
@@ -95,16 +158,9 @@ def generate_space(map_width: int,
 
     player = engine.player
 
-    space = GameMap(
-        engine=engine, 
-        width=map_width, 
-        height=map_height, 
-        entities=[player],
-        window_width=map_window_width,
-        window_height=map_window_height,
-    )
+    terrain_recipe = SpaceTerrain(map_width, map_height, seed=np.random.randint(2**31))
 
-    player.place(int(map_width/2), int(map_height/2), space)
+    player.x, player.y = int(map_width/2), int(map_height/2)
 
 
     stars = []
@@ -128,72 +184,122 @@ def generate_space(map_width: int,
 
 
         if all(prox_check):
-            new_StellarSystem = StellarSystem(
-                x=new_star.x, 
-                y=new_star.y,
-                star=copy.deepcopy(new_star),
+            new_StellarSystem = new_stellar_system(
+                star=new_star,
+                seed=np.random.randint(2**31),
+                map_width=map_window_width*4,
+                map_height=map_window_height*2,
             )
 
-            
-            new_StellarSystem.generate_planets(
-                width=map_window_width*4,
-                height=map_window_height*2
-            )            
-            
-            
-            system_map = generate_star_system(
-                engine=engine, 
-                map_width=map_window_width*4, 
-                map_height=map_window_height*2, 
-                window_width=map_window_width,
-                window_height=map_window_height,
-                stellar_system=new_StellarSystem,
-            )
-            
-            new_StellarSystem.game_map = system_map
-
             stellar_sys += [new_StellarSystem]
             stars += [new_star]
-            space.tiles[stars[-1].inner(map_width, map_height)] = stars[-1].tile
-            space.system_exit_location[stars[-1].outter(map_width, map_height)] = \
-            ~ space.system_exit_location[stars[-1].outter(map_width, map_height)]
+            terrain_recipe.add_star(new_star)
+
+    tiles, system_exit_location = terrain_recipe.build()
+    space = GameMap(
+        engine=engine, 
+        width=map_width, 
+        height=map_height, 
+        entities=[player],
+        window_width=map_window_width,
+        window_height=map_window_height,
+        tiles=tiles,
+    )
+    space.system_exit_location = system_exit_location
+    space.terrain_recipe = terrain_recipe
+    space.update_terrain()
+
+    player.place(player.x, player.y, space)
 
     #place_entities(stars, space, player, max_monsters, min_monsters, max_items)
 
-    return space, set(stellar_sys)
+    return space, stellar_sys
+
+
+def new_stellar_system(star: Star, seed: int, map_width: int, map_height: int) -> StellarSystem:
+    """Create the stellar system around a star placed on the galaxy map, with its planets."""
+    stellar_system = StellarSystem(
+        x=star.x, 
+        y=star.y,
+        star=copy.deepcopy(star),
+        seed=seed,
+        map_width=map_width,
+        map_height=map_height,
+    )
+
+    stellar_system.generate_planets()
+
+    # Inside of the system the star sits at the left edge, magnified.
+    stellar_system.star.x = 0
+    stellar_system.star.y = int(stellar_system.map_height/2)
+    stellar_system.star.r *= 5
+
+    return stellar_system
+
+
+def build_star_system_tiles(stellar_system: StellarSystem) -> np.ndarray:
+    """
+    Paint the terrain of a stellar system as a compact layer of `tile_types.palette` indices.
+
+    Only depends on the system itself, so it can run in a worker process.
+    """
+    map_width = stellar_system.map_width
+    map_height = stellar_system.map_height
+
+    rng = stellar_system.rng(TERRAIN_STREAM)
+    layer = np.full((map_width, map_height), tile_types.palette_index(tile_types.floor), dtype=np.uint8, order="F")
+    layer[rng.random(size=layer.shape) >= 0.95] = tile_types.palette_index(tile_types.floor_star)
+
+    layer[stellar_system.star.inner(map_width, map_height)] = tile_types.palette_index(stellar_system.star.tile)
+
+    for planet in stellar_system.planets:
+        layer[planet.inner(map_width, map_height)] = tile_types.palette_index(planet.tile_dark)
+        layer[planet.facing_star(map_width, map_height)] = tile_types.palette_index(planet.tile_light)
+
+    return layer
+
+
+def build_star_systems_tiles(
+    stellar_systems: Sequence[StellarSystem], max_workers: int = 1,
+) -> List[np.ndarray]:
+    """
+    Run `build_star_system_tiles` for many systems, spread over `max_workers` processes.
+
+    The result does not depend on the number of workers.
+    """
+    if max_workers <= 1 or len(stellar_systems) <= 1:
+        return [build_star_system_tiles(system) for system in stellar_systems]
+
+    chunksize = max(1, len(stellar_systems) // (max_workers * 4))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(build_star_system_tiles, stellar_systems, chunksize=chunksize))
 
 
 def generate_star_system(
         engine: Engine, 
-        map_width: int, 
-        map_height: int, 
         window_width: int,
         window_height: int,
         stellar_system: StellarSystem,
+        tile_layer: Optional[np.ndarray] = None,
     ):
+    """
+    Build the GameMap of a stellar system.  The same system always gives the same map.
+
+    `tile_layer` is the output of `build_star_system_tiles` if it was already built.
+    """
+    terrain_recipe = SystemTerrain(stellar_system)
+    tiles, system_exit_location = terrain_recipe.build(tile_layer)
 
     space = GameMap(
         engine=engine, 
-        width=map_width, 
-        height=map_height,
+        width=stellar_system.map_width, 
+        height=stellar_system.map_height,
         window_width=window_width,
         window_height=window_height,
+        tiles=tiles,
     )
-
-    stellar_system.star.x = 0
-    stellar_system.star.y = int(map_height/2)
-    stellar_system.star.r *= 5
-
-    space.tiles[stellar_system.star.inner(map_width, map_height)] = stellar_system.star.tile
-    space.system_exit_location[int(map_width-10):int(map_width),0:int(map_height)] = \
-        ~space.system_exit_location[int(map_width-10):int(map_width),0:int(map_height)]
-
-
-    if len(stellar_system.planets) != 0:
-        for planet in stellar_system.planets:
-            space.tiles[planet.inner(map_width, map_height)] = planet.tile_dark
-            space.tiles[planet.facing_star(map_width, map_height)] = planet.tile_light
-    
+    space.system_exit_location = system_exit_location
+    space.terrain_recipe = terrain_recipe
+    space.update_terrain()
 
     return space
-
@@ -0,0 +1,174 @@
+"""Projectiles kept in a table of NumPy arrays and moved all at once."""
+from __future__ import annotations
+
+from typing import Dict, List, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from entity import Actor
+    from game_map import GameMap
+
+
+projectile_dt = np.dtype(
+    [
+        ("x", np.int32),
+        ("y", np.int32),
+        ("vx", np.int32),
+        ("vy", np.int32),
+        ("lifetime", np.int32),  # Steps left, plus one: the last one only expires it.
+        ("action_points", np.int32),
+        ("speed", np.int32),  # Action points gained per turn.
+        ("origin", np.int32),  # Index of the shooter in ProjectileTable.origins.
+        ("damage", np.int32),  # Damage dealt on a hit, before the target's defense.
+    ]
+)
+
+# Action points a projectile spends per step.
+STEP_COST = 20
+
+# Lasers, as fired by ShootAction.
+LASER_LIFETIME = 20
+LASER_SPEED = 100
+LASER_COLOR = (255, 0, 0)
+
+
+class ProjectileTable:
+    """
+    The projectiles flying over a map, one row of `rows` per projectile.
+
+    A projectile flies in a straight line, (vx, vy) per step.  Every turn it gains
+    `speed` action points and takes one step for each STEP_COST it has above
+    STEP_COST, as long as it has `lifetime` left.  It is gone when it leaves the map,
+    runs into a wall or hits an actor, which takes its damage minus the actor's defense.
+
+    `step` moves all projectiles together, with a few array operations per step
+    whatever their number; only hits are resolved one by one.
+    """
+
+    def __init__(self, gamemap: GameMap, capacity: int = 64):
+        self.gamemap = gamemap
+        self.rows = np.zeros(capacity, dtype=projectile_dt)
+        self.count = 0
+
+        # Shooters, referenced by the `origin` column.
+        self.origins: List[Actor] = []
+        self._origin_ids: Dict[Actor, int] = {}
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def live(self) -> np.ndarray:
+        """The rows of the projectiles in flight."""
+        return self.rows[:self.count]
+
+    def fire(
+        self,
+        origin: Actor,
+        x: int,
+        y: int,
+        vx: int,
+        vy: int,
+        lifetime: int = LASER_LIFETIME,
+        speed: int = LASER_SPEED,
+    ) -> None:
+        """Launch a projectile from (x, y), dealing the power of `origin`."""
+        if self.count == len(self.rows):
+            self.rows = np.resize(self.rows, 2 * len(self.rows))
+
+        origin_id = self._origin_ids.get(origin)
+        if origin_id is None:
+            origin_id = self._origin_ids[origin] = len(self.origins)
+            self.origins.append(origin)
+
+        # One more than the moves it makes, as laser beam Effects counted it.
+        self.rows[self.count] = (x, y, vx, vy, lifetime + 1, 0, speed, origin_id, origin.fighter.power)
+        self.count += 1
+
+    def step(self) -> None:
+        """Move every projectile for one turn and resolve what they hit."""
+        if not self.count:
+            return
+
+        gamemap = self.gamemap
+        rows = self.live
+        rows["action_points"] += rows["speed"]
+        alive = np.ones(self.count, dtype=bool)
+
+        while True:
+            index = np.flatnonzero(alive & (rows["action_points"] > STEP_COST))
+            if not len(index):
+                break
+
+            lifetime = rows["lifetime"][index] - 1
+            rows["lifetime"][index] = lifetime
+            alive[index[lifetime <= 0]] = False
+            index = index[lifetime > 0]
+            rows["action_points"][index] -= STEP_COST
+
+            x = rows["x"][index] + rows["vx"][index]
+            y = rows["y"][index] + rows["vy"][index]
+            inside = (0 <= x) & (x < gamemap.width) & (0 <= y) & (y < gamemap.height)
+            alive[index[~inside]] = False
+            index, x, y = index[inside], x[inside], y[inside]
+
+            # Tiles held by a ship: resolve the hits one by one.
+            blocked = gamemap.occupancy[x, y] > 0
+            for i, hit_x, hit_y in zip(index[blocked].tolist(), x[blocked].tolist(), y[blocked].tolist()):
+                if self._hit(rows[i], hit_x, hit_y):
+                    alive[i] = False
+                else:
+                    rows["x"][i], rows["y"][i] = hit_x, hit_y
+
+            index, x, y = index[~blocked], x[~blocked], y[~blocked]
+            walkable = gamemap.tiles["walkable"][x, y]
+            alive[index[~walkable]] = False
+            rows["x"][index[walkable]] = x[walkable]
+            rows["y"][index[walkable]] = y[walkable]
+
+        self._compact(alive)
+
+    def _hit(self, row: np.void, x: int, y: int) -> bool:
+        """
+        Resolve a projectile entering a tile held by a ship.
+
+        Returns False if the tile was cleared earlier in the step, so the projectile
+        flies on into it.
+        """
+        gamemap = self.gamemap
+        target = gamemap.get_actor_at_location(x, y)
+        if target is None:
+            return not gamemap.is_passable(x, y)
+
+        origin = self.origins[row["origin"]]
+        damage = int(row["damage"]) - target.fighter.defense
+
+        attack_desc = f"{origin.name.capitalize()} hits {target.name} with laser"
+        if damage > 0:
+            gamemap.engine.message_log.add_message(f"{attack_desc} dealing {damage} damage.")
+            target.fighter.hp -= damage
+        else:
+            gamemap.engine.message_log.add_message(f"{attack_desc} but does no damage.")
+        return True
+
+    def _compact(self, alive: np.ndarray) -> None:
+        """Drop the projectiles that are gone, and the shooters nothing refers to anymore."""
+        if alive.all():
+            return
+
+        kept = self.live[alive]
+        self.count = len(kept)
+        self.rows[:self.count] = kept
+
+        if len(self.origins) > 2 * self.count + 16:
+            used, kept_origin = np.unique(kept["origin"], return_inverse=True)
+            self.origins = [self.origins[i] for i in used.tolist()]
+            self._origin_ids = {origin: i for i, origin in enumerate(self.origins)}
+            self.rows["origin"][:self.count] = kept_origin
+
+    def glyphs(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return the x, y and glyph of every projectile in flight."""
+        rows = self.live
+        ch = np.where(rows["vx"] == 0, ord("|"), ord("-"))
+        return rows["x"], rows["y"], ch
@@ -3,6 +3,7 @@ from __future__ import annotations
 from typing import Tuple, TYPE_CHECKING
 
 import color
+from timers import timers
 
 if TYPE_CHECKING:
     from tcod import Console
@@ -15,7 +16,7 @@ def get_names_at_location(x: int, y: int, game_map: GameMap) -> str:
         return ""
 
     names = ", ".join(
-        entity.name for entity in game_map.entities if entity.x == x and entity.y == y
+        entity.name for entity in game_map.get_entities_at_location(x, y)
     )
 
     return names.capitalize()
@@ -62,3 +63,47 @@ def render_names_at_mouse_location(
 
     console.print(x=x, y=y, string=names_at_mouse_location)
 
+
+
+PERF_OVERLAY_PHASES = [
+    ("frame", "Frame"),
+    ("present", " present"),
+    ("render", " render"),
+    ("render.map", "  map"),
+    ("render.log", "  log"),
+    ("render.hud", "  hud"),
+    ("handle_action", "Action"),
+    ("turn", " turn"),
+    ("projectiles", "  projectiles"),
+    ("fov", " fov"),
+]
+
+
+def render_perf_overlay(console: Console, engine: Engine, x: int = 0, y: int = 0) -> None:
+    """
+    Render the rolling phase timers, the entity counts and the actions that took the
+    most time in the last turns, see `timers`.
+    """
+    game_map = engine.game_map
+    hot = timers.hottest(("action.", "ai."), 5)
+    width, height = 40, len(PERF_OVERLAY_PHASES) + len(hot) + 7
+
+    console.draw_frame(
+        x=x, y=y, width=width, height=height, title="Performance (F3)", fg=color.white, bg=color.black,
+    )
+    lines = [f"{'':14}{'last':>7}{'mean':>7}{'max':>7} ms"]
+    for name, label in PERF_OVERLAY_PHASES:
+        stat = timers.stats.get(name)
+        if stat is None:
+            lines.append(f"{label:14}{'-':>7}")
+        else:
+            lines.append(f"{label:14}{stat.last * 1000:7.2f}{stat.mean * 1000:7.2f}{stat.max * 1000:7.2f}")
+    lines.append(f"{len(game_map.entities)} entities, {len(game_map.projectiles)} shots")
+    lines.append(f"{len(game_map.actors)} actors, {len(game_map.dormant)} dormant")
+    lines.append(f"{len(game_map.effects)} effects, {len(game_map.scheduler)} scheduled")
+    lines.append(f"{'Hottest per turn':24}{'ms':>7}{'calls':>7}")
+    for name, stat in hot:
+        lines.append(f" {name[:23]:23}{stat.mean * 1000:7.2f}{stat.mean_calls:7.0f}")
+
+    for i, line in enumerate(lines):
+        console.print(x=x + 1, y=y + 1 + i, string=line[:width - 2], fg=color.white)
@@ -0,0 +1,460 @@
+"""
+Chunked save file format.
+
+A save starts with a header and an index of its sections, followed by the
+sections themselves:
+
+    MAGIC | version, index length (2 x uint32) | index (JSON) | sections...
+
+Every map is stored as its own group of sections: one per NumPy layer of the
+map (`main/visible`, `main/explored`, ...) holding the raw array bytes, and
+`<map>/entities` with the rest of the map state, its entities included.  The
+engine, game world and player go in `engine`, the message log in
+`message_log`.
+
+The terrain layers of maps with a `terrain_recipe` are not stored.  They are
+generated again on load, and only the tiles that differ from the generated ones
+are kept, as `<map>/<layer>.changed` (flat indices) and `<map>/<layer>.values`.
+
+Saving happens in two steps: `snapshot` serializes the game state into an
+uncompressed SaveWriter, which does not refer to any game object, and
+`SaveWriter.write` compresses it and moves it into place.  The second step can
+run on another thread while the game goes on, see `autosave`.
+
+Loading decodes the engine and the current map only.  The other maps are left
+as empty GameMap objects which GameWorld.load_map fills in the first time they
+are needed, and saving copies the sections of maps that were never loaded
+straight from the save they came from.
+
+References from one section to the objects of another (an entity to its map,
+a map to its stellar system...) are pickled as persistent ids.  The only
+entity that can be referenced that way is the player; other entities are saved
+with the map they are on.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+import io
+import json
+import lzma
+import os
+import pickle
+import struct
+import time
+import zlib
+from typing import Any, BinaryIO, Collection, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from engine import Engine
+from exceptions import SaveFormatError
+from game_map import GameMap, GameWorld
+from tracing import record
+
+MAGIC = b"CSGSAVE\0"
+VERSION = 2
+
+# Map layers that can be generated again from the map's terrain recipe.
+TERRAIN_LAYERS = ("tiles", "system_exit_location")
+
+_HEADER = struct.Struct("<II")
+
+# Section codecs, as (compress, decompress).
+CODECS = {
+    "zlib": (zlib.compress, zlib.decompress),
+    "lzma": (lzma.compress, lzma.decompress),
+}
+
+PersistentId = Tuple[str, ...]
+
+
+def map_keys(game_world: GameWorld) -> Dict[GameMap, str]:
+    """
+    Return the section key of every map that goes in a save.
+
+    Keys only depend on the galaxy layout, so that the sections of a map are
+    valid in any save of the same game.
+    """
+    keys = {game_world.main_map: "main"}
+    for number, system in enumerate(game_world.stellar_systems):
+        game_map = game_world.system_maps.get(system)
+        if game_map is not None and not game_world.is_evictable(game_map):
+            keys[game_map] = f"system{number}"
+    return keys
+
+
+def _restore(obj: Any, state: dict) -> None:
+    setstate = getattr(obj, "__setstate__", None)
+    if setstate is not None:
+        setstate(state)
+    else:
+        obj.__dict__.update(state)
+
+
+class _SectionPickler(pickle.Pickler):
+    def __init__(self, file: io.BytesIO, refs: Dict[int, PersistentId], inline: Collection[int]):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.refs = refs
+        self.inline = inline
+
+    def persistent_id(self, obj: Any) -> Optional[PersistentId]:
+        key = id(obj)
+        if key in self.inline:
+            return None
+        return self.refs.get(key)
+
+
+class SaveReport:
+    """What writing a save took."""
+
+    def __init__(self, filename: str, size: int, snapshot_time: float, write_time: float):
+        self.filename = filename
+        self.size = size  # In bytes.
+        self.snapshot_time = snapshot_time  # Seconds the game was paused for.
+        self.write_time = write_time  # Seconds spent compressing and writing.
+
+    def __str__(self) -> str:
+        return (
+            f"{self.size / 1024:.1f} KB, snapshot {self.snapshot_time * 1000:.1f} ms, "
+            f"written in {self.write_time * 1000:.1f} ms"
+        )
+
+
+class SaveWriter:
+    """Collects the sections of a save and writes them out with their index."""
+
+    def __init__(self) -> None:
+        # Section name: (index entry, data, whether the data is already compressed).
+        self.sections: Dict[str, Tuple[dict, bytes, bool]] = {}
+        self.maps: Dict[str, Dict[str, List[str]]] = {}
+
+    def add(self, name: str, payload: bytes, codec: str, **meta: Any) -> None:
+        """Add a section, `payload` is compressed with `codec` when the save is written."""
+        self.sections[name] = (dict(meta, codec=codec), payload, False)
+
+    def add_pickle(
+        self, name: str, obj: Any, refs: Dict[int, PersistentId], inline: Collection[Any] = (),
+    ) -> None:
+        buffer = io.BytesIO()
+        _SectionPickler(buffer, refs, {id(o) for o in inline}).dump(obj)
+        self.add(name, buffer.getvalue(), "lzma")
+
+    def add_array(self, name: str, array: np.ndarray) -> None:
+        order = "F" if array.flags.f_contiguous and not array.flags.c_contiguous else "C"
+        self.add(
+            name,
+            array.tobytes(order=order),
+            "zlib",
+            dtype=np.lib.format.dtype_to_descr(array.dtype),
+            shape=list(array.shape),
+            order=order,
+        )
+
+    def add_map(self, key: str, game_map: GameMap, refs: Dict[int, PersistentId]) -> None:
+        state = game_map.__getstate__()
+
+        diffs = []
+        if game_map.terrain_recipe is not None:
+            for name, generated in zip(TERRAIN_LAYERS, game_map.terrain_recipe.build()):
+                current = state.pop(name).ravel(order="F")
+                changed = np.flatnonzero(current != generated.ravel(order="F")).astype(np.uint32)
+                self.add_array(f"{key}/{name}.changed", changed)
+                self.add_array(f"{key}/{name}.values", current[changed])
+                diffs.append(name)
+
+        arrays = [name for name, value in state.items() if isinstance(value, np.ndarray)]
+        for name in arrays:
+            self.add_array(f"{key}/{name}", state.pop(name))
+
+        self.add_pickle(f"{key}/entities", state, refs)
+        self.maps[key] = {"arrays": arrays, "diffs": diffs}
+
+    def copy_map(self, key: str, reader: SaveReader) -> None:
+        """Copy the sections of a map from another save without decoding them."""
+        layout = reader.index["maps"][key]
+        names = layout["arrays"] + ["entities"]
+        for name in layout["diffs"]:
+            names += [f"{name}.changed", f"{name}.values"]
+        for name in names:
+            section = f"{key}/{name}"
+            entry, data = reader.raw_section(section)
+            self.sections[section] = (entry, data, True)
+        self.maps[key] = layout
+
+    def write(self, filename: str) -> int:
+        """
+        Compress the sections and write the save, return its size in bytes.
+
+        The save is written next to `filename` and renamed over it once complete, so
+        an interrupted write never leaves a broken save behind.
+        """
+        temporary = f"{filename}.tmp"
+        with open(temporary, "wb") as f:
+            size = self._write_to(f)
+        os.replace(temporary, filename)
+        return size
+
+    def encode(self) -> bytes:
+        """Compress the sections and return the save as bytes."""
+        f = io.BytesIO()
+        self._write_to(f)
+        return f.getvalue()
+
+    def _write_to(self, f: BinaryIO) -> int:
+        index: Dict[str, Any] = {"sections": {}, "maps": self.maps}
+        blobs = []
+        offset = 0
+        for name, (entry, data, compressed) in self.sections.items():
+            if not compressed:
+                compress, _ = CODECS[entry["codec"]]
+                data = compress(data)
+            index["sections"][name] = dict(entry, offset=offset, length=len(data))
+            blobs.append(data)
+            offset += len(data)
+        index_data = json.dumps(index).encode("utf-8")
+
+        f.write(MAGIC)
+        f.write(_HEADER.pack(VERSION, len(index_data)))
+        f.write(index_data)
+        for data in blobs:
+            f.write(data)
+        return f.tell()
+
+
+class SaveReader:
+    """
+    Decodes the sections of a save on demand.
+
+    The maps of the save exist from the start as empty GameMap objects; `pending`
+    holds the ones that were not loaded yet, with their key.
+
+    A reader can also decode its sections into a game that is already running:
+    `engine` is then the running engine, and `maps` its maps by key, empty
+    GameMap objects for the ones to be loaded from the save.
+    """
+
+    def __init__(self, data: bytes, engine: Optional[Engine] = None, maps: Optional[Dict[str, GameMap]] = None):
+        if not data.startswith(MAGIC):
+            raise SaveFormatError("Not a save file.")
+        version, index_length = _HEADER.unpack_from(data, len(MAGIC))
+        if version != VERSION:
+            raise SaveFormatError(f"Unsupported save version {version}.")
+
+        index_start = len(MAGIC) + _HEADER.size
+        self.index = json.loads(data[index_start:index_start + index_length])
+        self.data = data
+        self.data_start = index_start + index_length
+
+        if engine is None:
+            self.engine: Engine = Engine.__new__(Engine)
+            self.maps: Dict[str, GameMap] = {
+                key: GameMap.__new__(GameMap) for key in self.index["maps"]
+            }
+            self._message_log = None
+        else:
+            self.engine = engine
+            self.maps = maps
+            self._message_log = engine.message_log
+        self.pending: Dict[GameMap, str] = {
+            game_map: key for key, game_map in self.maps.items() if key in self.index["maps"]
+        }
+
+    def raw_section(self, name: str) -> Tuple[dict, bytes]:
+        """Return the index entry and the still encoded bytes of a section."""
+        entry = dict(self.index["sections"][name])
+        start = self.data_start + entry.pop("offset")
+        return entry, self.data[start:start + entry.pop("length")]
+
+    def read(self, name: str) -> bytes:
+        entry, data = self.raw_section(name)
+        _, decompress = CODECS[entry["codec"]]
+        return decompress(data)
+
+    def read_array(self, name: str) -> np.ndarray:
+        entry = self.index["sections"][name]
+        dtype = np.lib.format.descr_to_dtype(entry["dtype"])
+        # Copied into a bytearray to get a writable array.
+        array = np.frombuffer(bytearray(self.read(name)), dtype=dtype)
+        return array.reshape(entry["shape"], order=entry["order"])
+
+    def read_pickle(self, name: str) -> Any:
+        unpickler = pickle.Unpickler(io.BytesIO(self.read(name)))
+        unpickler.persistent_load = self._persistent_load
+        return unpickler.load()
+
+    def _persistent_load(self, pid: PersistentId) -> Any:
+        kind = pid[0]
+        if kind == "map":
+            return self.maps[pid[1]]
+        if kind == "engine":
+            return self.engine
+        if kind == "system":
+            return self.engine.game_world.stellar_systems[pid[1]]
+        if kind == "player":
+            return self.engine.player
+        if kind == "message_log":
+            if self._message_log is None:
+                self._message_log = self.read_pickle("message_log")
+            return self._message_log
+        raise SaveFormatError(f"Unknown reference {pid!r}.")
+
+    def load_engine(self) -> Engine:
+        """Load the engine and the map it is on."""
+        _restore(self.engine, self.read_pickle("engine"))
+        self.load_map(self.engine.game_map)
+        if self.pending:
+            self.engine.game_world.map_source = self
+        return self.engine
+
+    def load_map(self, game_map: GameMap) -> None:
+        """Fill in a map of this save, if it was not loaded yet."""
+        key = self.pending.pop(game_map, None)
+        if key is None:
+            return
+
+        layout = self.index["maps"][key]
+        state = self.read_pickle(f"{key}/entities")
+        for name in layout["arrays"]:
+            state[name] = self.read_array(f"{key}/{name}")
+
+        if layout["diffs"]:
+            for name, layer in zip(TERRAIN_LAYERS, state["terrain_recipe"].build()):
+                if name in layout["diffs"]:
+                    flat = layer.ravel(order="F")  # A view, `layer` is F-contiguous.
+                    flat[self.read_array(f"{key}/{name}.changed")] = self.read_array(f"{key}/{name}.values")
+                state[name] = layer
+
+        _restore(game_map, state)
+
+
+def references(engine: Engine, keys: Dict[GameMap, str]) -> Dict[int, PersistentId]:
+    """Return the persistent ids of the objects sections refer to, by object id."""
+    refs: Dict[int, PersistentId] = {id(game_map): ("map", key) for game_map, key in keys.items()}
+    refs[id(engine)] = ("engine",)
+    refs[id(engine.player)] = ("player",)
+    refs[id(engine.message_log)] = ("message_log",)
+    for number, system in enumerate(engine.game_world.stellar_systems):
+        refs[id(system)] = ("system", number)
+    return refs
+
+
+def snapshot(engine: Engine) -> SaveWriter:
+    """Serialize `engine` and the galaxy, ready to be written by another thread."""
+    game_world = engine.game_world
+    source = game_world.map_source
+    keys = map_keys(game_world)
+    refs = references(engine, keys)
+
+    writer = SaveWriter()
+    writer.add_pickle(
+        "engine", engine.__getstate__(), refs, inline=[engine.player, *game_world.stellar_systems],
+    )
+    writer.add_pickle("message_log", engine.message_log, refs, inline=(engine.message_log,))
+
+    for game_map, key in keys.items():
+        if source is not None and game_map in source.pending:
+            writer.copy_map(source.pending[game_map], source)
+        elif game_map in game_world.frozen_maps:
+            writer.copy_map(key, SaveReader(game_world.frozen_maps[game_map]))
+        else:
+            writer.add_map(key, game_map, refs)
+
+    return writer
+
+
+def freeze_map(game_world: GameWorld, game_map: GameMap) -> bytes:
+    """
+    Return `game_map` encoded as the sections it has in a save, see `GameWorld.freeze_map`.
+
+    Its key is the one it has in saves, so that they copy its sections as they are.
+    """
+    keys = map_keys(game_world)
+    writer = SaveWriter()
+    writer.add_map(keys[game_map], game_map, references(game_world.engine, keys))
+    return writer.encode()
+
+
+def thaw_map(game_world: GameWorld, game_map: GameMap, data: bytes) -> None:
+    """Fill in the emptied `game_map` from the sections `freeze_map` returned."""
+    keys = map_keys(game_world)
+    SaveReader(data, game_world.engine, {key: m for m, key in keys.items()}).load_map(game_map)
+
+
+def save(engine: Engine, filename: str) -> SaveReport:
+    """Write `engine` and the galaxy to a save file."""
+    start = time.perf_counter()
+    writer = snapshot(engine)
+    snapshot_done = time.perf_counter()
+    size = writer.write(filename)
+    end = time.perf_counter()
+    record("snapshot", "save", start, end=snapshot_done)
+    record("write", "save", snapshot_done, end=end)
+    record("save", "save", start, args={"filename": filename, "size": size}, end=end)
+    return SaveReport(filename, size, snapshot_done - start, end - snapshot_done)
+
+
+def load(filename: str) -> Engine:
+    """Load the engine and current map of a save file, the other maps load on demand."""
+    with open(filename, "rb") as f:
+        data = f.read()
+
+    if not data.startswith(MAGIC):
+        # Saves from before the chunked format are a single pickle.
+        return upgrade_legacy(pickle.loads(lzma.decompress(data)))
+
+    return SaveReader(data).load_engine()
+
+
+def upgrade_legacy(engine: Engine) -> Engine:
+    """
+    Bring a game saved as a single pickle up to date, returns it.
+
+    These saves predate the engine caches, the maps' indexes, and the world
+    keeping the system maps: every stellar system held its own map, and had
+    no seed to build it again from.
+    """
+    engine.__dict__.setdefault("index", 0)
+    engine._player_distance = None
+    engine._player_distance_key = None
+    engine._fov_key = None
+    engine.autosaver = None
+
+    world = engine.game_world
+    world.stellar_systems = list(world.stellar_systems)
+    system_maps = OrderedDict()
+    for seed, system in enumerate(world.stellar_systems):
+        game_map = system.__dict__.pop("game_map", None)
+        if "seed" not in system.__dict__:
+            system.seed = seed
+            size = (game_map.width, game_map.height) if game_map is not None else (world.map_width, world.map_height)
+            system.map_width, system.map_height = size
+        if game_map is not None:
+            system_maps[system] = game_map
+    # These maps have no terrain recipe, so they are never evicted nor rebuilt.
+    world.system_maps = system_maps
+    world.__dict__.setdefault("system_map_budget", 4)
+    world.__dict__.setdefault("generation_workers", 1)
+    world.map_source = None
+
+    for game_map in {world.main_map, engine.game_map, *system_maps.values()}:
+        if game_map is not None and "entity_index" not in game_map.__dict__:
+            game_map.rebuild()
+            upgrade_legacy_lasers(game_map)
+    return engine
+
+
+def upgrade_legacy_lasers(game_map: GameMap) -> None:
+    """
+    Move the laser beam Effects in flight over `game_map` to its projectile table.
+
+    Lasers were Effects stepping (vx, vy) of one element tuples, with as many
+    `lifetime_in_turns` left as a projectile row has `lifetime`.
+    """
+    projectiles = game_map.projectiles
+    for effect in list(game_map.effects):
+        if effect.name != "laser beam" or effect.origin is None:
+            continue
+        vx, vy = (v[0] if isinstance(v, tuple) else v for v in (effect.vx, effect.vy))
+        game_map.remove_entity(effect)
+        projectiles.fire(effect.origin, effect.x, effect.y, vx, vy, effect.lifetime_in_turns - 1, effect.speed)
+        projectiles.rows["action_points"][projectiles.count - 1] = effect.action_points
@@ -1,19 +1,27 @@
 """Handle the loading and initialization of game sessions."""
 from __future__ import annotations
 
-import copy
-import lzma
-import pickle
 import traceback
 from typing import Optional
 
 import tcod
 
+from autosave import Autosaver
 import color
 from engine import Engine
 import entity_factories
 import input_handlers
 from game_map import GameWorld
+from message_log import MessageArchive
+import savefile
+
+SAVE_FILENAME = "savegame.sav"
+
+# Where messages that no longer fit in the message log go.
+MESSAGE_ARCHIVE_FILENAME = "savegame.log"
+
+# Turns between two autosaves.
+AUTOSAVE_INTERVAL = 100
 
 # Load the background image and remove the alpha channel.
 background_image = tcod.image.load("menu_background_space.png")[:, :, :3]
@@ -33,9 +41,13 @@ def new_game() -> Engine:
 
     max_items = 1
 
-    player = copy.deepcopy(entity_factories.player)
+    system_map_budget = 4
+    generation_workers = 1
+
+    player = entity_factories.player.clone()
 
     engine = Engine(player=player)
+    engine.message_log.archive = MessageArchive(MESSAGE_ARCHIVE_FILENAME)
 
     engine.game_world = GameWorld(
         map_window_width=map_window_width, 
@@ -45,6 +57,8 @@ def new_game() -> Engine:
         max_monsters=max_monsters,
         min_monsters=min_monsters,
         max_items = max_items,
+        system_map_budget=system_map_budget,
+        generation_workers=generation_workers,
         engine=engine,
     )
     
@@ -55,8 +69,8 @@ def new_game() -> Engine:
         "The galaxy is dark and full of danger...", color.welcome_text
     )
 
-    dagger_laser = copy.deepcopy(entity_factories.dagger_laser)
-    basic_armor = copy.deepcopy(entity_factories.basic_armor)
+    dagger_laser = entity_factories.dagger_laser.clone()
+    basic_armor = entity_factories.basic_armor.clone()
 
     dagger_laser.parent = player.inventory
     basic_armor.parent = player.inventory
@@ -67,14 +81,16 @@ def new_game() -> Engine:
     player.inventory.items.append(basic_armor)
     player.equipment.toggle_equip(basic_armor, add_message=False)
 
+    engine.autosaver = Autosaver(SAVE_FILENAME, AUTOSAVE_INTERVAL)
+
     return engine
 
 
 def load_game(filename: str) -> Engine:
     """Load an Engine instance from a file."""
-    with open(filename, "rb") as f:
-        engine = pickle.loads(lzma.decompress(f.read()))
+    engine = savefile.load(filename)
     assert isinstance(engine, Engine)
+    engine.autosaver = Autosaver(filename, AUTOSAVE_INTERVAL)
     return engine
 
 
@@ -121,7 +137,7 @@ class MainMenu(input_handlers.BaseEventHandler):
             raise SystemExit()
         elif event.sym == tcod.event.K_c:
             try:
-                return input_handlers.MainGameEventHandler(load_game("savegame.sav"))
+                return input_handlers.MainGameEventHandler(load_game(SAVE_FILENAME))
             except FileNotFoundError:
                 return input_handlers.PopupMessage(self, "No saved game to load.")
             except Exception as exc:
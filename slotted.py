@@ -0,0 +1,45 @@
+"""Pickling support for classes that keep their attributes in __slots__."""
+from __future__ import annotations
+
+from typing import Dict, Tuple, Type
+
+_slot_names: Dict[type, Tuple[str, ...]] = {}
+
+
+def slot_names(cls: Type) -> Tuple[str, ...]:
+    """Return the names of the slots of `cls` and its bases."""
+    names = _slot_names.get(cls)
+    if names is None:
+        names = []
+        for klass in reversed(cls.__mro__):
+            slots = klass.__dict__.get("__slots__", ())
+            if isinstance(slots, str):
+                slots = (slots,)
+            names.extend(name for name in slots if name not in ("__dict__", "__weakref__"))
+        names = _slot_names[cls] = tuple(names)
+    return names
+
+
+class Slotted:
+    """
+    Base of the classes that have many instances and no per-instance __dict__.
+
+    Pickles and copies hold the attributes in a dict, as they did when these classes
+    had a __dict__, so saves load whichever way they were written.  Unset slots are
+    left out.
+    """
+
+    __slots__ = ()
+
+    def __getstate__(self) -> dict:
+        state = dict(getattr(self, "__dict__", ()))  # Subclasses without __slots__.
+        for name in slot_names(type(self)):
+            try:
+                state[name] = object.__getattribute__(self, name)
+            except AttributeError:
+                pass
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
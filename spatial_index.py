@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from typing import Dict, Iterator, List, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from entity import Entity
+
+
+class SpatialIndex:
+    """
+    Maps tile coordinates to the entities standing on them.
+
+    The index only knows about the positions it was told about, so every
+    change of an entity's coordinates on a GameMap has to be reported
+    through `add`, `remove` or `update`.
+    """
+
+    def __init__(self) -> None:
+        self._cells: Dict[Tuple[int, int], List[Entity]] = {}
+        self._positions: Dict[Entity, Tuple[int, int]] = {}
+
+    def __contains__(self, entity: Entity) -> bool:
+        return entity in self._positions
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def add(self, entity: Entity) -> None:
+        """Start tracking `entity` at its current position."""
+        if entity in self._positions:
+            self.update(entity)
+            return
+
+        position = (entity.x, entity.y)
+        self._positions[entity] = position
+        self._cells.setdefault(position, []).append(entity)
+
+    def remove(self, entity: Entity) -> None:
+        """Stop tracking `entity`.  Unknown entities are ignored."""
+        position = self._positions.pop(entity, None)
+        if position is not None:
+            self._discard_from_cell(entity, position)
+
+    def update(self, entity: Entity) -> None:
+        """Move `entity` to the cell matching its current coordinates."""
+        old_position = self._positions.get(entity)
+        new_position = (entity.x, entity.y)
+
+        if old_position == new_position:
+            return
+        if old_position is not None:
+            self._discard_from_cell(entity, old_position)
+
+        self._positions[entity] = new_position
+        self._cells.setdefault(new_position, []).append(entity)
+
+    def at(self, x: int, y: int) -> List[Entity]:
+        """Return the entities at the given tile, as a new list."""
+        return list(self._cells.get((x, y), ()))
+
+    def in_rect(self, x1: int, y1: int, x2: int, y2: int) -> Iterator[Entity]:
+        """
+        Iterate over the entities inside the rectangle [x1, x2) x [y1, y2).
+
+        Meant for small areas; cost is proportional to the number of tiles,
+        or to the number of entities if that is smaller.
+        """
+        if (x2 - x1) * (y2 - y1) > len(self._positions):
+            yield from (
+                entity
+                for entity, (x, y) in list(self._positions.items())
+                if x1 <= x < x2 and y1 <= y < y2
+            )
+            return
+
+        cells = self._cells
+        for x in range(x1, x2):
+            for y in range(y1, y2):
+                cell = cells.get((x, y))
+                if cell:
+                    yield from tuple(cell)
+
+    def _discard_from_cell(self, entity: Entity, position: Tuple[int, int]) -> None:
+        cell = self._cells[position]
+        cell.remove(entity)
+        if not cell:
+            del self._cells[position]
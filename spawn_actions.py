@@ -3,7 +3,8 @@ from __future__ import annotations
 from typing import Optional, Tuple, TYPE_CHECKING
 import numpy as np
 
-from effects_factory import laser_beam, explosion
+import effects_factory
+from effects_factory import explosion
 import color
 import exceptions
 
@@ -11,6 +12,9 @@ if TYPE_CHECKING:
     from engine import Engine
     from entity import Actor, Entity, Item, Effect
 
+# Dormant actors this close to an explosion wake up, see `GameMap.sleep`.
+EXPLOSION_WAKE_RADIUS = 10
+
 class SpawnAction:
     def __init__(self, entity: Actor, cost: int = 100) -> None:
         super().__init__()
@@ -44,20 +48,9 @@ class ShootAction(SpawnAction):
         self.dy = dy
 
     def perform(self) -> None:
-        projectile = laser_beam.spawn(
-            gamemap=self.entity.gamemap, 
-            x=self.entity.x, 
-            y=self.entity.y,
+        self.entity.gamemap.projectiles.fire(
+            self.entity, self.entity.x, self.entity.y, self.dx, self.dy,
         )
-        projectile.vx=1*self.dx,
-        projectile.vy=1*self.dy,
-        projectile.origin=self.entity
-
-        if projectile.name == 'laser beam':
-            if self.dy == 0:
-                projectile.char = '-'
-
-        return projectile
 
 
 class ExplodeAction(SpawnAction):
@@ -70,10 +63,14 @@ class ExplodeAction(SpawnAction):
         y_low = int(gamemap.engine.player.y-gamemap.window_height/2)
         x = range(self.entity.x-1,self.entity.x+2)
         y = range(self.entity.y-1,self.entity.y+2)
+        gamemap.wake_area(self.entity.x, self.entity.y, EXPLOSION_WAKE_RADIUS)
 
         for xi in x:
             for yi in y:
-                explosion.spawn(
+                if not gamemap.in_bounds(xi, yi):
+                    continue
+                effects_factory.spawn(
+                    "explosion",
                     gamemap=self.entity.gamemap,
                     x=xi, 
                     y=yi,
@@ -0,0 +1,92 @@
+"""Saving and loading games, saves written by older versions of the game included."""
+import os
+
+from message_log import MessageArchive
+import savefile
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+
+def test_load_legacy_single_pickle_save(tmp_path):
+    """A save from before the chunked format loads, plays a turn and saves again."""
+    engine = savefile.load(os.path.join(DATA, "legacy_savegame.sav"))
+    game_map = engine.game_map
+
+    assert engine.player in game_map.entities
+    assert engine.player in game_map.entity_index
+    assert game_map.occupancy[engine.player.x, engine.player.y] == 1
+    assert engine.game_world.system_maps
+
+    engine.update_fov()
+    engine.main_turns_cycle()
+
+    filename = str(tmp_path / "save.sav")
+    engine.save_as(filename)
+    reloaded = savefile.load(filename)
+    assert (reloaded.player.x, reloaded.player.y) == (engine.player.x, engine.player.y)
+    assert len(reloaded.game_world.system_maps) == len(engine.game_world.system_maps)
+
+
+def test_load_legacy_save_with_laser_in_flight():
+    """Laser beam Effects of a save from before the projectile table fly on as rows of it."""
+    engine = savefile.load(os.path.join(DATA, "legacy_savegame_laser.sav"))
+    game_map = engine.game_map
+
+    assert not any(effect.name == "laser beam" for effect in game_map.effects)
+    assert len(game_map.projectiles) == 1
+    row = game_map.projectiles.live[0]
+    assert (row["vx"], row["vy"]) == (1, 0)
+    assert row["lifetime"] == 17
+    x = int(row["x"])
+
+    engine.update_fov()
+    engine.main_turns_cycle()
+    # 20 action points left over and 100 gained: five steps of STEP_COST.
+    assert game_map.projectiles.live[0]["x"] == x + 5
+
+
+def test_load_save_without_its_message_archive(tmp_path):
+    """Messages archived in a file lost since the save are left out of the history."""
+    engine = savefile.load(os.path.join(DATA, "legacy_savegame.sav"))
+    log = engine.message_log
+    log.archive = MessageArchive(str(tmp_path / "savegame.log"))
+    for i in range(log.messages.maxlen + 50):
+        log.add_message(f"Message {i}", stack=False)
+    assert len(log.archive) > 50
+
+    filename = str(tmp_path / "save.sav")
+    engine.save_as(filename)
+    log.archive.delete()
+
+    log = savefile.load(filename).message_log
+    assert len(log.archive) == 0
+    assert len(log) == log.messages.maxlen
+    lines = log.wrapped(0, len(log), 40)
+    assert lines[-1][2] == [f"Message {log.messages.maxlen + 49}"]
+
+
+def test_system_maps_over_the_budget_are_frozen(tmp_path):
+    """System maps that cannot be rebuilt from a seed are frozen over the budget, and saved as they were."""
+    engine = savefile.load(os.path.join(DATA, "legacy_savegame.sav"))
+    world = engine.game_world
+    # These maps predate the terrain recipes, none of them can be dropped.
+    maps = list(world.system_maps.values())
+    tiles = {game_map: game_map.tiles.copy() for game_map in maps}
+    entities = {game_map: sorted((e.name, e.x, e.y) for e in game_map.entities) for game_map in maps}
+
+    world.evict_system_maps()
+    assert sum(world.is_loaded(game_map) for game_map in maps) == world.system_map_budget
+    assert len(world.frozen_maps) == len(maps) - world.system_map_budget
+    assert engine.game_map not in world.frozen_maps
+
+    filename = str(tmp_path / "save.sav")
+    engine.save_as(filename)
+    reloaded = savefile.load(filename).game_world
+    assert len(reloaded.system_maps) == len(maps)
+
+    for game_map, saved in zip(maps, reloaded.system_maps.values()):
+        for world_map in (world.load_map(game_map), reloaded.load_map(saved)):
+            assert (world_map.tiles == tiles[game_map]).all()
+            assert sorted((e.name, e.x, e.y) for e in world_map.entities) == entities[game_map]
+            assert all(e.gamemap is world_map for e in world_map.entities)
+    assert not world.frozen_maps
@@ -176,3 +176,39 @@ frozen_planet_light = new_tile(
     light=(ord(" "), (255, 255, 255), (0,0,205)),
 )
 
+
+
+# Every tile type.  Compact tile layers store indices into this array instead of
+# the full tile structs, `palette[layer]` turns them back into tiles.
+palette = np.array(
+    [
+        floor,
+        floor_star,
+        system_exit,
+        M_type_star,
+        K_type_star,
+        G_type_star,
+        F_type_star,
+        A_type_star,
+        B_type_star,
+        O_type_star,
+        base_planet_dark,
+        base_planet_light,
+        gas_giant_planet_dark,
+        gas_giant_planet_light,
+        super_earth_planet_dark,
+        super_earth_planet_light,
+        molten_planet_dark,
+        molten_planet_light,
+        frozen_planet_dark,
+        frozen_planet_light,
+    ],
+    dtype=tile_dt,
+)
+
+_palette_indices = {tile.tobytes(): index for index, tile in enumerate(palette)}
+
+
+def palette_index(tile: np.ndarray) -> int:
+    """Return the index of a tile type in `palette`."""
+    return _palette_indices[tile.tobytes()]
@@ -0,0 +1,93 @@
+"""
+Timers for the phases of a frame and a turn, shown by the performance overlay.
+
+Timing is off unless `timers.enabled` is set (F3 in game toggles it along with
+the overlay).  Code is timed through `tracing.span` and `tracing.record`, which
+feed the timers and the tracer alike and do nothing while both are disabled.
+"""
+from __future__ import annotations
+
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+
+
+class RollingStat:
+    """The last `window` samples of a phase: seconds, and calls per sample."""
+
+    def __init__(self, window: int):
+        self.seconds: Deque[float] = deque(maxlen=window)
+        self.calls: Deque[int] = deque(maxlen=window)
+
+    def add(self, seconds: float, calls: int = 1) -> None:
+        self.seconds.append(seconds)
+        self.calls.append(calls)
+
+    @property
+    def last(self) -> float:
+        return self.seconds[-1]
+
+    @property
+    def mean(self) -> float:
+        return sum(self.seconds) / len(self.seconds)
+
+    @property
+    def max(self) -> float:
+        return max(self.seconds)
+
+    @property
+    def mean_calls(self) -> float:
+        return sum(self.calls) / len(self.calls)
+
+
+class PhaseTimers:
+    """
+    Rolling statistics per phase.
+
+    `add` records a sample of a phase that runs once per frame or turn.  Phases that
+    run many times per turn, like the actions of every entity, are summed up with
+    `accumulate` and recorded as one sample per turn by `flush`.
+    """
+
+    def __init__(self, window: int = 60):
+        self.enabled = False
+        self.window = window
+        self.stats: Dict[str, RollingStat] = {}
+        self._pending: Dict[str, List[float]] = {}  # name: [seconds, calls]
+
+    def add(self, name: str, seconds: float) -> None:
+        stat = self.stats.get(name)
+        if stat is None:
+            stat = self.stats[name] = RollingStat(self.window)
+        stat.add(seconds)
+
+    def accumulate(self, name: str, seconds: float) -> None:
+        pending = self._pending.get(name)
+        if pending is None:
+            self._pending[name] = [seconds, 1]
+        else:
+            pending[0] += seconds
+            pending[1] += 1
+
+    def flush(self) -> None:
+        """Record the accumulated phases as one sample each."""
+        for name, (seconds, calls) in self._pending.items():
+            stat = self.stats.get(name)
+            if stat is None:
+                stat = self.stats[name] = RollingStat(self.window)
+            stat.add(seconds, calls)
+        self._pending.clear()
+
+    def toggle(self) -> None:
+        """Switch timing on or off, starting over with no samples."""
+        self.enabled = not self.enabled
+        self.stats.clear()
+        self._pending.clear()
+
+    def hottest(self, prefixes: Tuple[str, ...], count: int) -> List[Tuple[str, RollingStat]]:
+        """Return the `count` phases starting with one of `prefixes` that take the most time."""
+        stats = [(name, stat) for name, stat in self.stats.items() if name.startswith(prefixes)]
+        stats.sort(key=lambda item: item[1].mean, reverse=True)
+        return stats[:count]
+
+
+timers = PhaseTimers()
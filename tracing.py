@@ -0,0 +1,180 @@
+"""
+A tracer recording what the game spends its time on, for offline inspection.
+
+While `tracer.enabled` is set (F4 in game starts and stops it, `headless.py
+--trace` traces a headless run), spans are recorded for player actions, each
+entity's turn with its `decide_what_to_do` calls and actions, pathfinding,
+the field of view, render passes and saves.  The last `capacity` spans are
+kept in a ring buffer; `dump` writes them in the Chrome Trace Event format,
+which chrome://tracing and https://ui.perfetto.dev open.  `main.main` dumps
+the buffer to CRASH_TRACE_FILENAME when the game crashes.
+
+Code is timed and traced through `span`, which does nothing unless `timers` or
+the tracer is enabled:
+
+    with span("update_fov", "fov", timer="fov"):
+        ...
+
+A `with` statement costs more than the flag checks it saves in loops over every
+entity, which check the flags once and call `record` instead:
+
+    profiled = timers.enabled or tracer.enabled
+    ...
+    if profiled:
+        start = time.perf_counter()
+    entity.decide_what_to_do()
+    if profiled:
+        record("decide_what_to_do", "ai", start, args=args)
+"""
+from __future__ import annotations
+
+from collections import deque
+import json
+import os
+import threading
+import time
+from typing import Any, Deque, Dict, Optional, Tuple, Union
+
+from timers import timers
+
+TRACE_FILENAME = "trace.json"
+CRASH_TRACE_FILENAME = "crash-trace.json"
+
+# name, category, start, end (perf_counter seconds), thread id, args
+Span = Tuple[str, str, float, float, int, Optional[Dict[str, Any]]]
+
+
+class Tracer:
+    """
+    Records spans of time in a ring buffer of `capacity` spans.
+
+    Every span is stored whole, as a Chrome "complete" event with its start and
+    duration, so dropping the oldest ones never leaves a begin without its end.
+    """
+
+    def __init__(self, capacity: int = 200_000):
+        self.enabled = False
+        self.spans: Deque[Span] = deque(maxlen=capacity)
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def start(self) -> None:
+        """Start recording, dropping the spans of a previous recording."""
+        self.spans.clear()
+        self.enabled = True
+
+    def stop(self) -> None:
+        self.enabled = False
+
+    def complete(
+        self,
+        name: str,
+        category: str,
+        start: float,
+        args: Optional[Dict[str, Any]] = None,
+        end: Optional[float] = None,
+    ) -> None:
+        """Record a span from `start`, a `time.perf_counter()` reading, until `end` or now."""
+        if end is None:
+            end = time.perf_counter()
+        self.spans.append((name, category, start, end, threading.get_ident(), args))
+
+    def to_json(self) -> Dict[str, Any]:
+        """Return the recorded spans as a Chrome Trace Event document."""
+        pid = os.getpid()
+        events = []
+        for name, category, start, end, tid, args in self.spans:
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": pid,
+                "tid": tid,
+            }
+            if args:
+                event["args"] = args
+            events.append(event)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump(self, filename: str = TRACE_FILENAME) -> int:
+        """Write the recorded spans to `filename`, returns the number of spans written."""
+        document = self.to_json()
+        with open(filename, "w") as f:
+            json.dump(document, f)
+        return len(document["traceEvents"])
+
+
+tracer = Tracer()
+
+
+def record(
+    name: str,
+    category: str,
+    start: float,
+    timer: Optional[str] = None,
+    args: Optional[Dict[str, Any]] = None,
+    accumulate: bool = False,
+    end: Optional[float] = None,
+) -> None:
+    """
+    Record the time from `start` until `end` or now for `timers`, as the phase
+    `timer` if there is one, and as a span for `tracer`, whichever is enabled.
+
+    Phases that run many times per turn are summed up with `accumulate`, see
+    `PhaseTimers.accumulate`.
+    """
+    if end is None:
+        end = time.perf_counter()
+    if timer is not None and timers.enabled:
+        if accumulate:
+            timers.accumulate(timer, end - start)
+        else:
+            timers.add(timer, end - start)
+    if tracer.enabled:
+        tracer.complete(name, category, start, args, end)
+
+
+class Span:
+    """Times and traces a `with` block, see `span`."""
+
+    __slots__ = ("name", "category", "timer", "args", "start")
+
+    def __init__(self, name: str, category: str, timer: Optional[str], args: Optional[Dict[str, Any]]):
+        self.name = name
+        self.category = category
+        self.timer = timer
+        self.args = args
+
+    def __enter__(self) -> Span:
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        record(self.name, self.category, self.start, self.timer, self.args)
+
+
+class NoSpan:
+    """What `span` returns while neither timers nor the tracer are enabled."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> NoSpan:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        pass
+
+
+NO_SPAN = NoSpan()
+
+
+def span(
+    name: str, category: str, timer: Optional[str] = None, args: Optional[Dict[str, Any]] = None,
+) -> Union[Span, NoSpan]:
+    """Return a context manager recording its block with `record`."""
+    if tracer.enabled or (timer is not None and timers.enabled):
+        return Span(name, category, timer, args)
+    return NO_SPAN
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import heapq
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from entity import Entity
+
+ScheduleKey = Tuple[int, ...]
+
+
+class TurnScheduler:
+    """
+    Priority queue deciding which entity gains energy and acts next.
+
+    Every scheduled entity has a key `(turn, sequence, ...)`: the turn on which it
+    next receives its `speed` worth of action points, and its place in the queue
+    of that turn.  Entities re-queued for the following turn keep the round-robin
+    order, and an entity that is still pending from an interrupted turn comes up
+    before everyone else in the next one.
+
+    Entities spawned during another entity's activation are keyed right behind
+    their spawner (`schedule_after`), so they act in the same turn.
+
+    Removal is lazy: `discard` only forgets the current key of an entity and its
+    stale heap entry is dropped once it reaches the top.
+
+    The queue is not ordered by accumulated action points over speed.  Every
+    entity is activated once per turn and spends all the points it has in that
+    activation (the `while action` loop of `Engine.main_turns_cycle`), so a fast
+    ship acts several times in a row rather than between slower ones.  Ordering
+    by energy would interleave them, changing who gets to move or shoot first,
+    and would lose the round-robin order the game always had.
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[ScheduleKey, Entity]] = []
+        self._keys: Dict[Entity, ScheduleKey] = {}
+        self._sequence = 0
+
+    def __contains__(self, entity: Entity) -> bool:
+        return entity in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _push(self, entity: Entity, key: ScheduleKey) -> ScheduleKey:
+        self._sequence += 1
+        self._keys[entity] = key
+        heapq.heappush(self._heap, (key, entity))
+        return key
+
+    def schedule(self, entity: Entity, turn: int) -> ScheduleKey:
+        """Queue `entity` for the given turn, behind everything already queued for it."""
+        return self._push(entity, (turn, self._sequence))
+
+    def schedule_after(self, entity: Entity, key: ScheduleKey) -> ScheduleKey:
+        """Queue `entity` directly behind the entry with the given key."""
+        return self._push(entity, key + (self._sequence,))
+
+    def discard(self, entity: Entity) -> None:
+        self._keys.pop(entity, None)
+
+    def pop_due(self, turn: int) -> Optional[Tuple[Entity, ScheduleKey]]:
+        """
+        Remove and return the next entity due on or before `turn`, with its key.
+
+        Returns None when nothing else is due.
+        """
+        heap = self._heap
+        while heap and heap[0][0][0] <= turn:
+            key, entity = heapq.heappop(heap)
+            if self._keys.get(entity) == key:
+                del self._keys[entity]
+                return entity, key
+
+        return None